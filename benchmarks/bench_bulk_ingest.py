@@ -0,0 +1,51 @@
+"""
+Measures bulk ingestion throughput for an increasing number of worker processes.
+
+Usage:
+    python benchmarks/bench_bulk_ingest.py --files 16 --users 20000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from core.ingest import ingest_files  # noqa: E402
+from synthetic import make_export  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=16, help='Number of weekly exports to ingest.')
+    parser.add_argument('--users', type=int, default=20000, help='Number of user rows per export.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as export_dir:
+        sources = []
+        for i in range(args.files):
+            week_start = (pd.Timestamp('2025-01-05') + pd.Timedelta(weeks=i)).strftime('%Y-%m-%d')
+            filename = os.path.join(export_dir, f"User Report {week_start}.csv")
+            make_export(args.users, week_start, seed=i).to_csv(filename, index=False)
+            sources.append((filename, filename))
+
+        cpu_count = os.cpu_count() or 1
+        worker_counts = sorted({1, 2, 4, cpu_count} & set(range(1, cpu_count + 1)))
+        print(f"Ingesting {args.files} files x {args.users:,} users ({cpu_count} CPUs)")
+        baseline = None
+        for workers in worker_counts:
+            # A fresh store per run, so no file is skipped or restored from the ingest cache
+            with tempfile.TemporaryDirectory() as store_dir:
+                start = time.perf_counter()
+                _, report = ingest_files(sources, store_dir, max_workers=workers)
+                elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(f"  workers={workers:>3}  {elapsed:7.2f}s  {len(report['processed']) / elapsed:6.2f} files/s  "
+                  f"speedup={baseline / elapsed:4.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+"""
+Reports the in-memory footprint of the shipped master_*.parquet files, as read
+as-is and after applying the compact master schema.
+
+Usage:
+    python benchmarks/bench_memory.py
+"""
+import os
+import sys
+
+import pandas as pd
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+from core.data import apply_master_schema, MASTER_COLS, MASTER_TABLES  # noqa: E402
+
+
+def main():
+    total_before, total_after = 0, 0
+    print(f"{'table':<8} {'rows':>8} {'before':>10} {'after':>10} {'ratio':>7}")
+    for table in MASTER_TABLES:
+        df = pd.read_parquet(os.path.join(ROOT, f"master_{table}.parquet"))
+        before = df.memory_usage(deep=True).sum()
+        after = apply_master_schema(df, MASTER_COLS[table]).memory_usage(deep=True).sum()
+        total_before += before
+        total_after += after
+        print(f"{table:<8} {len(df):>8,} {before / 1024:>8.0f}KB {after / 1024:>8.0f}KB {before / after:>6.1f}x")
+    print(f"{'total':<8} {'':>8} {total_before / 1024:>8.0f}KB {total_after / 1024:>8.0f}KB "
+          f"{total_before / total_after:>6.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Reports the cold import time of the app's modules and the time to the first
+render of src/app.py, so startup regressions show up.
+
+Each import is timed in a fresh interpreter, so nothing is already in
+sys.modules. The first render runs app.py headless through Streamlit's AppTest, on
+a temporary copy of the data, so the partitions, rollups and caches it writes
+never end up in the working tree.
+
+Usage:
+    python benchmarks/bench_startup.py --runs 5
+"""
+import argparse
+import glob
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+SRC = os.path.join(ROOT, 'src')
+
+# What app.py reads from the project root: the master store (or the legacy files it is migrated from),
+# the cohort definitions and the page icon
+DATA = ['master', 'master_*.parquet', 'pm_emails.csv', 'cohorts', 'assets']
+
+MODULES = ['core.llm_client', 'ui.plot_agent', 'ui.key_metrics', 'ui.sidebar', 'core.data']
+
+# Modules that must stay out of a cold start, as they are only needed once a chart is requested
+DEFERRED = ['openai', 'google.generativeai', 'plotly.express']
+
+_IMPORT_SCRIPT = """
+import sys, time
+sys.path.insert(0, {src!r})
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(elapsed, ','.join(name for name in {deferred!r} if name in sys.modules))
+"""
+
+_RENDER_SCRIPT = """
+import os, sys, time
+sys.path.insert(0, {src!r})
+os.chdir({data_dir!r})
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file(os.path.join({src!r}, 'app.py'), default_timeout=600)
+app.run()
+elapsed = time.perf_counter() - start
+if app.exception:
+    raise SystemExit(app.exception[0].message)
+print(elapsed)
+"""
+
+
+def _copy_data(target):
+    """Copies the data app.py reads into a directory to render it from."""
+    for pattern in DATA:
+        for source in glob.glob(os.path.join(ROOT, pattern)):
+            if os.path.isdir(source):
+                shutil.copytree(source, os.path.join(target, os.path.basename(source)))
+            else:
+                shutil.copy2(source, target)
+
+
+def _run(script):
+    result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, cwd=ROOT)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else result.stdout)
+    return result.stdout.split()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='Number of cold starts to time per measurement.')
+    args = parser.parse_args()
+
+    print(f"{'cold import':<24} {'median':>9} {'min':>9}  deferred modules loaded")
+    for module in MODULES:
+        timings, loaded = [], ''
+        for _ in range(args.runs):
+            out = _run(_IMPORT_SCRIPT.format(src=SRC, module=module, deferred=DEFERRED))
+            timings.append(float(out[0]))
+            loaded = out[1] if len(out) > 1 else ''
+        print(f"{module:<24} {statistics.median(timings) * 1000:>7.0f}ms {min(timings) * 1000:>7.0f}ms  "
+              f"{loaded or '-'}")
+
+    timings = []
+    with tempfile.TemporaryDirectory() as data_dir:
+        _copy_data(data_dir)
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            out = _run(_RENDER_SCRIPT.format(src=SRC, data_dir=data_dir))
+            timings.append((float(out[0]), time.perf_counter() - start))
+    print(f"{'first render of app.py':<24} {statistics.median(t for t, _ in timings) * 1000:>7.0f}ms "
+          f"{min(t for t, _ in timings) * 1000:>7.0f}ms  "
+          f"(process total {statistics.median(t for _, t in timings) * 1000:.0f}ms)")
+
+
+if __name__ == '__main__':
+    main()
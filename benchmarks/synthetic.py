@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+
+MODELS = ['gpt-4o', 'gpt-4.5', 'o3', 'o3-mini', 'o4-mini', 'gpt-4o-mini', 'gpt-4.1']
+TOOLS = ['Search', 'Data Analysis', 'Dall-E', 'Canvas', 'Deep Research', 'File Search']
+
+
+def _dict_cells(rng, keys, n_rows):
+    """Builds dictionary-like strings in the same format as the ChatGPT Enterprise export."""
+    cells = []
+    for _ in range(n_rows):
+        n_keys = rng.integers(0, len(keys) + 1)
+        if n_keys == 0:
+            cells.append('0')
+            continue
+        chosen = rng.choice(keys, size=n_keys, replace=False)
+        cells.append(str({str(key): int(rng.integers(1, 200)) for key in chosen}))
+    return cells
+
+
+def make_export(n_users, week_start='2025-03-23', seed=0):
+    """
+    Generates a synthetic weekly usage export with the columns `process_uploaded_file` expects.
+
+    Args:
+        n_users (int): The number of user rows in the export.
+        week_start (str): The `period_start` date of the export.
+        seed (int): The random seed, so runs are reproducible.
+
+    Returns:
+        pd.DataFrame: The raw export, as `pd.read_csv` would return it.
+    """
+    rng = np.random.default_rng(seed)
+    emails = [f"user{i}@company{i % 40}.com" for i in range(n_users)]
+    last_active = pd.Timestamp(week_start) + pd.to_timedelta(rng.integers(0, 7, n_users), unit='D')
+    return pd.DataFrame({
+        'period_start': week_start,
+        'period_end': (pd.Timestamp(week_start) + pd.Timedelta(days=6)).strftime('%Y-%m-%d'),
+        'email': emails,
+        'name': [f"User {i}" for i in range(n_users)],
+        'user_status': rng.choice(['enabled', 'pending', 'deleted'], n_users, p=[0.9, 0.05, 0.05]),
+        'is_active': rng.random(n_users) < 0.7,
+        'messages': rng.integers(0, 500, n_users),
+        'gpts_messaged': rng.integers(0, 20, n_users),
+        'tools_messaged': rng.integers(0, 50, n_users),
+        'projects_created': rng.integers(0, 5, n_users),
+        'last_day_active': last_active.strftime('%Y-%m-%d'),
+        'model_to_messages': _dict_cells(rng, MODELS, n_users),
+        'tool_to_messages': _dict_cells(rng, TOOLS, n_users),
+    })
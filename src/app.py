@@ -1,10 +1,14 @@
 import streamlit as st
-import pandas as pd
-from core.data import load_master_dataframes
-from ui.sidebar import show_sidebar
+from core.cohorts import cohort_flag
+from core.retention import build_weekly_activity
+from core.rollups import select_rollups
+from core.query import query_filtered_views, query_weekly_rollups, query_weekly_activity
+from core.views import build_filtered_views
+from ui.sidebar import show_sidebar, get_master_store, get_view_cache
 from ui.explore_dataframes import show_explore_dataframes
 from ui.plot_agent import show_plot_agent
 from ui.key_metrics import show_key_metrics
+from ui.retention import show_retention
 
 # --- Page Configuration ---
 st.set_page_config(
@@ -17,49 +21,67 @@ st.set_page_config(
 st.title("Flagship Pioneering ChatGPT Usage Analytics")
 st.write("---")
 
-# --- Initialize Session State ---
-if 'initialized' not in st.session_state:
-    users_df, models_df, tools_df = load_master_dataframes()
-    
-    st.session_state.users_df = users_df
-    st.session_state.models_df = models_df
-    st.session_state.tools_df = tools_df
-    
-    st.session_state.initialized = True
-
-# --- Load PM Emails ---
-pm_emails_df = pd.read_csv("pm_emails.csv")
-pm_emails = pm_emails_df["email"].tolist()
+# --- Master Data ---
+# All sessions share one read-only store. Each run works on the snapshot current
+# when it starts, so uploads from any session, or weeks written by the ingest CLI
+# or another server process, show up on the next rerun.
+# Only the weekly rollups are read at startup, so the key metrics render without
+# touching the fact tables. Those are loaded once the metrics are on screen.
+store = get_master_store()
+snapshot = store.snapshot()
 
 
 # --- Render UI and Apply Filters ---
-pm_only, start_date, end_date = show_sidebar()
+cohort, start_date, end_date, query_engine = show_sidebar(snapshot)
 
-# Create initial filtered views based on the pm_only filter.
-if pm_only:
-    users_df_view = st.session_state.users_df[st.session_state.users_df["email"].isin(pm_emails)].copy()
-    models_df_view = st.session_state.models_df[st.session_state.models_df["email"].isin(pm_emails)].copy()
-    tools_df_view = st.session_state.tools_df[st.session_state.tools_df["email"].isin(pm_emails)].copy()
-else:
-    users_df_view = st.session_state.users_df.copy()
-    models_df_view = st.session_state.models_df.copy()
-    tools_df_view = st.session_state.tools_df.copy()
+# --- Render the main page content using separate components ---
+# Filtered views are memoized on (engine, cohort, date range, data version), so a
+# rerun that changes none of them (e.g. a plot agent button click) reuses them as they are.
+view_cache = get_view_cache()
+view_key = (query_engine, cohort, start_date, end_date, snapshot.version)
 
-# Apply the date range filter if it's available
-if start_date and end_date:
-    for df_view in [users_df_view, models_df_view, tools_df_view]:
-        if not df_view.empty:
-            df_view['week_start'] = pd.to_datetime(df_view['week_start']).dt.date
-            df_view.query("@start_date <= week_start <= @end_date", inplace=True)
+# Key metrics section (full width at the top), read from the weekly rollups of the selected cohort and date range
+if query_engine == "DuckDB":
+    rollups_view = view_cache.get(
+        ('rollups',) + view_key,
+        lambda: query_weekly_rollups(snapshot.cohorts, cohort, start_date, end_date)
+    )
+else:
+    rollups_view = view_cache.get(
+        ('rollups',) + view_key, lambda: select_rollups(snapshot.rollups, cohort, start_date, end_date)
+    )
+show_key_metrics(rollups_view['users'], rollups_view['models'], rollups_view['tools'])
+st.markdown("---")
 
-# Sort all dataframes by date in descending order before displaying
-users_df_view = users_df_view.sort_values(by='week_start', ascending=False).reset_index(drop=True)
-models_df_view = models_df_view.sort_values(by='week_start', ascending=False).reset_index(drop=True)
-tools_df_view = tools_df_view.sort_values(by='week_start', ascending=False).reset_index(drop=True)
+# The fact tables are only needed from here on
+if query_engine == "DuckDB":
+    # Push the cohort and date filters down into DuckDB over the master Parquet files,
+    # so the fact tables are never loaded into pandas
+    users_df_view, models_df_view, tools_df_view = view_cache.get(
+        ('views',) + view_key, lambda: query_filtered_views(snapshot.cohorts, cohort, start_date, end_date)
+    )
+else:
+    # One fact snapshot serves the rest of the run. If another session published a newer
+    # version since the run started, everything built from the facts is keyed by that version.
+    facts = store.snapshot(facts=True)
+    view_key = view_key[:-1] + (facts.version,)
+    users_df_view, models_df_view, tools_df_view = view_cache.get(
+        ('views',) + view_key, lambda: build_filtered_views(facts, cohort, start_date, end_date)
+    )
 
-# --- Render the main page content using separate components ---
-# Key metrics section (full width at the top)
-show_key_metrics(users_df_view, models_df_view, tools_df_view)
+# Adoption and retention over all uploaded weeks of the cohort, from per-week bitsets of active user ids
+if query_engine == "DuckDB":
+    activity = view_cache.get(
+        ('activity', query_engine, cohort, snapshot.version), lambda: query_weekly_activity(snapshot.cohorts, cohort)
+    )
+else:
+    activity = view_cache.get(
+        ('activity', query_engine, cohort, facts.version),
+        lambda: build_weekly_activity(
+            facts.users_df, facts.week_index['users'], len(facts.user_dim), cohort_flag(facts.cohorts, cohort)
+        )
+    )
+show_retention(activity)
 st.markdown("---")
 
 # Create two-column layout for dataframe exploration and plot agent
@@ -67,8 +89,8 @@ left_col, right_col = st.columns(2)
 
 # Left column: Dataframe exploration
 with left_col:
-    show_explore_dataframes(users_df_view, models_df_view, tools_df_view)
+    show_explore_dataframes(users_df_view, models_df_view, tools_df_view, view_key)
 
 # Right column: Plot agent
 with right_col:
-    show_plot_agent(users_df_view, models_df_view, tools_df_view)
+    show_plot_agent(users_df_view, models_df_view, tools_df_view, view_key)
@@ -0,0 +1,91 @@
+import glob
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# A cohort is a named list of user emails. PM is defined by pm_emails.csv, and every
+# cohorts/<name>.csv file with an `email` column defines one more cohort.
+# ALL_USERS is not a cohort of its own but the unfiltered view.
+ALL_USERS = 'all'
+PM_COHORT = 'PM'
+COHORTS_DIR = 'cohorts'
+
+# Membership is resolved into one integer of bit flags per user and fact row,
+# bit i being set for the i-th cohort, so a cohort filter is a bitwise AND.
+MAX_COHORTS = 63
+
+
+def load_cohorts(path='.'):
+    """
+    Loads the cohort definitions.
+
+    Args:
+        path (str): The directory holding pm_emails.csv and the cohorts/ directory.
+
+    Returns:
+        dict: The sorted member emails of every cohort, by name, PM first.
+    """
+    cohort_files = {}
+    pm_file = os.path.join(path, 'pm_emails.csv')
+    if os.path.exists(pm_file):
+        cohort_files[PM_COHORT] = pm_file
+    for cohort_file in sorted(glob.glob(os.path.join(path, COHORTS_DIR, '*.csv'))):
+        cohort_files[os.path.splitext(os.path.basename(cohort_file))[0]] = cohort_file
+
+    if len(cohort_files) > MAX_COHORTS:
+        raise ValueError(f"At most {MAX_COHORTS} cohorts are supported, found {len(cohort_files)}.")
+    if ALL_USERS in cohort_files:
+        raise ValueError(f"'{ALL_USERS}' is reserved and cannot be used as a cohort name.")
+    return {
+        name: sorted(pd.read_csv(cohort_file)['email'].dropna().astype(str).unique())
+        for name, cohort_file in cohort_files.items()
+    }
+
+
+def cohort_fingerprint(cohorts):
+    """Identifies a set of cohort definitions, e.g. the one persisted rollups were computed with."""
+    return hashlib.sha256(json.dumps(cohorts, sort_keys=True).encode()).hexdigest()
+
+
+def cohort_flags(emails, cohorts):
+    """
+    Resolves the cohort membership of users, in one pass per cohort.
+
+    Args:
+        emails (array-like): The user emails.
+        cohorts (dict): The cohort definitions, as returned by load_cohorts().
+
+    Returns:
+        np.ndarray: The int64 bit flags of every user.
+    """
+    emails = pd.Index(emails)
+    flags = np.zeros(len(emails), dtype=np.int64)
+    for bit, members in enumerate(cohorts.values()):
+        flags |= emails.isin(members).astype(np.int64) << bit
+    return flags
+
+
+def cohort_flag(cohorts, cohort):
+    """
+    Returns the bit flag of a cohort, or None for ALL_USERS.
+
+    Args:
+        cohorts (dict): The cohort definitions.
+        cohort (str): A cohort name, or ALL_USERS.
+
+    Returns:
+        int: The cohort's bit flag.
+    """
+    if cohort == ALL_USERS:
+        return None
+    return 1 << list(cohorts).index(cohort)
+
+
+def cohort_rows(df, flag):
+    """Returns the rows of a frame with a `cohorts` column that belong to a cohort (all rows for None)."""
+    if flag is None:
+        return df
+    return df[(df['cohorts'].to_numpy() & flag) != 0]
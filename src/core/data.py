@@ -1,8 +1,17 @@
 import pandas as pd
+import numpy as np
 import os
+import glob
+import shutil
 import ast
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from collections import namedtuple
 from datetime import datetime
 
+from core.cohorts import load_cohorts, cohort_flags
+
 # Define the columns for each of the three master DataFrames
 # This ensures consistency across the application.
 USER_COLS = [
@@ -12,6 +21,112 @@ USER_COLS = [
 MODEL_COLS = ['week_start', 'email', 'name', 'model', 'messages']
 TOOL_COLS = ['week_start', 'email', 'name', 'tool', 'messages']
 
+# The master tables are stored as one Parquet file per table and week,
+# e.g. master/users/2025-03-23.parquet, so uploads and deletions only touch one week.
+MASTER_DIR = 'master'
+MASTER_TABLES = ('users', 'models', 'tools')
+
+# The single compact schema shared by all three master DataFrames. Repeated strings
+# are categorical (dictionary-encoded in Parquet) and message counters are 32-bit.
+MASTER_DTYPES = {
+    'week_start': 'datetime64[ns]',
+    'email': 'category',
+    'name': 'category',
+    'user_status': 'category',
+    'is_active': 'bool',
+    'messages': 'int32',
+    'gpts_messaged': 'int32',
+    'tools_messaged': 'int32',
+    'projects_created': 'int32',
+    'last_day_active': 'datetime64[ns]',
+    'model': 'category',
+    'tool': 'category',
+    'user_id': 'int32',
+    'cohorts': 'int64',
+    'name_week': 'datetime64[ns]',
+}
+MASTER_COLS = {'users': USER_COLS, 'models': MODEL_COLS, 'tools': TOOL_COLS}
+
+# In memory, email and name live in a user dimension table and the three fact tables
+# are keyed by its integer user_id instead. user_id is the row position in the
+# dimension, so looking users up is a plain array take. Both also carry the cohort
+# bit flags of each user (see core.cohorts), resolved whenever the data changes.
+# A user's name is the one of their latest week, which name_week records.
+USER_DIM_COLS = ['user_id', 'email', 'name', 'cohorts', 'name_week']
+FACT_COLS = {table: ['week_start', 'user_id', 'cohorts'] + cols[3:] for table, cols in MASTER_COLS.items()}
+
+# The Arrow types matching MASTER_DTYPES, used for the partition files so every
+# file gets the same column types no matter what each chunk happens to contain.
+_ARROW_TYPES = {
+    'datetime64[ns]': pa.timestamp('ns'),
+    'category': pa.dictionary(pa.int32(), pa.string()),
+    'bool': pa.bool_(),
+    'int32': pa.int32(),
+}
+MASTER_ARROW_SCHEMAS = {
+    table: pa.schema([(col, _ARROW_TYPES[MASTER_DTYPES[col]]) for col in cols])
+    for table, cols in MASTER_COLS.items()
+}
+
+# Exports larger than this are ingested chunk by chunk to keep peak memory bounded.
+STREAMING_THRESHOLD_BYTES = 50 * 1024 * 1024
+STREAMING_CHUNK_ROWS = 50_000
+
+# Free-text columns are always read as strings, so every chunk parses them the same way.
+_TEXT_COLUMN_DTYPES = {
+    'email': str, 'name': str, 'user_status': str, 'model_to_messages': str, 'tool_to_messages': str
+}
+
+# Patterns used to parse the `model_to_messages` / `tool_to_messages` cells in bulk.
+# A well-formed cell only holds quoted keys (no escapes, commas or colons) mapped to
+# integer counts that fit in 64 bits, so it can be split on commas and parsed in bulk.
+_DICT_KEY = r"""(?:'[^'\\,:]*'|"[^"\\,:]*")"""
+_DICT_ENTRY_PATTERN = r"^(?P<key>" + _DICT_KEY + r")\s*:\s*(?P<value>-?\d{1,18})$"
+_DICT_CELL_PATTERN = (
+    r"^\{\s*(?:" + _DICT_KEY + r"\s*:\s*-?\d{1,18}(?:\s*,\s*" + _DICT_KEY + r"\s*:\s*-?\d{1,18})*\s*,?)?\s*\}$"
+)
+
+
+def apply_master_schema(df, columns):
+    """
+    Casts a DataFrame to the compact master schema, keeping only the given columns.
+
+    Args:
+        df (pd.DataFrame): The DataFrame to cast.
+        columns (list): The master columns of the table (USER_COLS, MODEL_COLS or TOOL_COLS).
+
+    Returns:
+        pd.DataFrame: The DataFrame with the master column order and data types.
+    """
+    return df.reindex(columns=columns).astype({col: MASTER_DTYPES[col] for col in columns})
+
+
+def concat_master_frames(frames, columns):
+    """
+    Concatenates DataFrames of the same master table without losing the compact schema.
+    Categorical columns are aligned on the sorted union of their categories first,
+    since pandas would otherwise fall back to object columns.
+
+    Args:
+        frames (list): The DataFrames to concatenate.
+        columns (list): The master columns of the table.
+
+    Returns:
+        pd.DataFrame: The concatenated DataFrame, with a fresh index.
+    """
+    frames = [apply_master_schema(df, columns) for df in frames]
+    for col in columns:
+        if MASTER_DTYPES[col] == 'category':
+            categories = frames[0][col].cat.categories.sort_values()
+            for df in frames[1:]:
+                categories = categories.union(df[col].cat.categories, sort=True)
+            frames = [
+                df if df[col].cat.categories.equals(categories)
+                else df.assign(**{col: df[col].cat.set_categories(categories)})
+                for df in frames
+            ]
+    return pd.concat(frames, ignore_index=True)
+
 
 def initialize_master_dataframes():
     """
@@ -21,26 +136,176 @@ def initialize_master_dataframes():
     Returns:
         tuple: A tuple containing the three empty (users, models, tools) DataFrames.
     """
-    users_df = pd.DataFrame(columns=USER_COLS)
-    models_df = pd.DataFrame(columns=MODEL_COLS)
-    tools_df = pd.DataFrame(columns=TOOL_COLS)
-    
-    # Set data types for more efficient storage and operations
-    users_df = users_df.astype({
-        'week_start': 'datetime64[ns]', 'email': 'str', 'name': 'str', 'user_status': 'category', 
-        'is_active': 'bool', 'messages': 'int', 'gpts_messaged': 'int', 'tools_messaged': 'int', 
-        'projects_created': 'int', 'last_day_active': 'datetime64[ns]'
-    })
-    models_df = models_df.astype({'week_start': 'datetime64[ns]', 'email': 'str', 'name': 'str', 'model': 'str', 'messages': 'int'})
-    tools_df = tools_df.astype({'week_start': 'datetime64[ns]', 'email': 'str', 'name': 'str', 'tool': 'str', 'messages': 'int'})
-    
-    return users_df, models_df, tools_df
+    return tuple(apply_master_schema(pd.DataFrame(), MASTER_COLS[table]) for table in MASTER_TABLES)
+
+
+# In memory, the fact tables are sorted by week (undated rows last) and come with a
+# week index: the sorted integer week keys (days since 1970-01-01) and the row offset
+# where each week starts, plus a final offset where the dated rows end. A date range
+# is then two binary searches and a slice, and dropping a week is a range drop.
+WeekIndex = namedtuple('WeekIndex', ['keys', 'offsets'])
+
+
+def week_keys(weeks):
+    """Converts dates or Timestamps to integer week keys (days since 1970-01-01)."""
+    return np.asarray(pd.to_datetime(weeks), dtype='datetime64[D]').astype(np.int32)
+
+
+def sort_by_week(df):
+    """
+    Sorts a fact table by week, keeping the order of rows within a week and
+    putting undated rows last, and builds its week index.
+
+    Args:
+        df (pd.DataFrame): A users, models or tools DataFrame.
+
+    Returns:
+        tuple: The sorted DataFrame, with a fresh index, and its WeekIndex.
+    """
+    df = df.sort_values('week_start', kind='stable', na_position='last', ignore_index=True)
+    n_dated = int(df['week_start'].notna().sum())
+    days = week_keys(df['week_start'].to_numpy()[:n_dated])
+    starts = np.flatnonzero(np.diff(days, prepend=days[:1] - 1)) if n_dated else np.empty(0, dtype=np.int64)
+    return df, WeekIndex(days[starts], np.append(starts, n_dated).astype(np.int64))
+
+
+def week_rows(index, start_date=None, end_date=None):
+    """
+    Finds the rows of the weeks within a date range with two binary searches.
+
+    Args:
+        index (WeekIndex): The week index of a week-sorted table.
+        start_date (date): The first week to include, or None for no lower bound.
+        end_date (date): The last week to include, or None for no upper bound.
+
+    Returns:
+        tuple: The (start, stop) row positions of the dated rows in the range.
+    """
+    lo = 0 if start_date is None else np.searchsorted(index.keys, week_keys([start_date])[0], side='left')
+    hi = len(index.keys) if end_date is None else np.searchsorted(index.keys, week_keys([end_date])[0], side='right')
+    return int(index.offsets[lo]), int(index.offsets[max(hi, lo)])
+
+
+def drop_weeks(df, index, weeks):
+    """
+    Removes whole weeks from a week-sorted table as row ranges, updating its week index.
+
+    Args:
+        df (pd.DataFrame): A week-sorted users, models or tools DataFrame.
+        index (WeekIndex): Its week index.
+        weeks (list): The week_start values to remove (NaT removes the undated rows).
+
+    Returns:
+        tuple: The DataFrame without those weeks, with a fresh index, and its WeekIndex.
+    """
+    weeks = pd.to_datetime(list(weeks))
+    positions = np.flatnonzero(np.isin(index.keys, week_keys(weeks.dropna())))
+    drop_undated = bool(weeks.isna().any())
+    if not len(positions) and not drop_undated:
+        return df, index
+    keep = np.ones(len(index.keys), dtype=bool)
+    keep[positions] = False
+    lengths = np.diff(index.offsets)
+
+    # Keep the row ranges between the dropped weeks, and the undated rows after them unless NaT is dropped too
+    end = index.offsets[-1] if drop_undated else len(df)
+    bounds = [0] + [edge for pos in positions for edge in (index.offsets[pos], index.offsets[pos + 1])] + [end]
+    df = pd.concat(
+        [df.iloc[start:stop] for start, stop in zip(bounds[::2], bounds[1::2])], ignore_index=True
+    )
+    offsets = np.append(0, np.cumsum(lengths[keep])).astype(np.int64)
+    return df, WeekIndex(index.keys[keep], offsets)
+
+
+def _partition_dir(path, table):
+    """Returns the directory holding the weekly partition files of one master table."""
+    return os.path.join(path, MASTER_DIR, table)
+
+
+def _partition_file(path, table, week):
+    """Returns the partition file of one master table for the given week."""
+    week = pd.to_datetime(week)
+    name = 'undated' if pd.isna(week) else week.strftime('%Y-%m-%d')
+    return os.path.join(_partition_dir(path, table), f"{name}.parquet")
+
+
+def save_week_partitions(users_df, models_df, tools_df, path='.'):
+    """
+    Writes one Parquet partition per table for every week present in the given
+    DataFrames. Those weeks are replaced as a whole (a table without rows for a
+    week loses its old partition), while partitions of other weeks are left
+    untouched, so the cost of a write only depends on the size of the new data.
+
+    Args:
+        users_df (pd.DataFrame): The users rows of the weeks to write.
+        models_df (pd.DataFrame): The models rows of the weeks to write.
+        tools_df (pd.DataFrame): The tools rows of the weeks to write.
+        path (str): The directory holding the master store.
+    """
+    frames = (users_df, models_df, tools_df)
+    weeks = set(pd.concat([df['week_start'] for df in frames]).unique())
+    for table, df in zip(MASTER_TABLES, frames):
+        os.makedirs(_partition_dir(path, table), exist_ok=True)
+        written = set()
+        for week, week_df in df.groupby('week_start', dropna=False):
+            partition_file = _partition_file(path, table, week)
+            # Write to a temporary file first so readers never see a partial partition
+            temp_file = partition_file + '.tmp'
+            pq.write_table(pa.Table.from_pandas(week_df, schema=MASTER_ARROW_SCHEMAS[table], preserve_index=False), temp_file)
+            os.replace(temp_file, partition_file)
+            written.add(partition_file)
+        _remove_stale_partitions(path, table, weeks, written)
+
+
+def _remove_stale_partitions(path, table, weeks, written):
+    """Removes the partitions of replaced weeks that the new data has no rows for."""
+    for week in weeks:
+        partition_file = _partition_file(path, table, week)
+        if partition_file not in written and os.path.exists(partition_file):
+            os.remove(partition_file)
+
+
+def copy_week_partitions(weeks, source_path, target_path):
+    """
+    Copies whole weeks from one master store to another, replacing them in the target.
+
+    Args:
+        weeks (list): The week_start values to copy.
+        source_path (str): The directory holding the source master store.
+        target_path (str): The directory holding the target master store.
+    """
+    for table in MASTER_TABLES:
+        os.makedirs(_partition_dir(target_path, table), exist_ok=True)
+        written = set()
+        for week in weeks:
+            source_file = _partition_file(source_path, table, week)
+            if os.path.exists(source_file):
+                target_file = _partition_file(target_path, table, week)
+                shutil.copyfile(source_file, target_file + '.tmp')
+                os.replace(target_file + '.tmp', target_file)
+                written.add(target_file)
+        _remove_stale_partitions(target_path, table, weeks, written)
+
+
+def delete_week_partition(week, path='.'):
+    """
+    Deletes the partition files of a single week from all three master tables.
+
+    Args:
+        week (datetime-like): The week_start of the partition to delete.
+        path (str): The directory holding the master store.
+    """
+    for table in MASTER_TABLES:
+        partition_file = _partition_file(path, table, week)
+        if os.path.exists(partition_file):
+            os.remove(partition_file)
 
 
 def save_master_dataframes(users_df, models_df, tools_df, path='.'):
     """
-    Saves the master DataFrames to Parquet files for persistence.
-    This is called after a new file is successfully uploaded and processed.
+    Saves the complete master DataFrames to the week-partitioned store.
+    Existing partitions are replaced, so this should only be used to (re)build
+    the store; regular uploads go through save_week_partitions().
 
     Args:
         users_df (pd.DataFrame): The updated master users DataFrame.
@@ -48,15 +313,56 @@ def save_master_dataframes(users_df, models_df, tools_df, path='.'):
         tools_df (pd.DataFrame): The updated master tools DataFrame.
         path (str): The directory where the files will be saved.
     """
-    users_df.to_parquet(os.path.join(path, 'master_users.parquet'))
-    models_df.to_parquet(os.path.join(path, 'master_models.parquet'))
-    tools_df.to_parquet(os.path.join(path, 'master_tools.parquet'))
+    for table in MASTER_TABLES:
+        table_dir = _partition_dir(path, table)
+        if os.path.isdir(table_dir):
+            for partition_file in glob.glob(os.path.join(table_dir, '*.parquet')):
+                os.remove(partition_file)
+    save_week_partitions(users_df, models_df, tools_df, path)
+
+
+def _migrate_legacy_master_files(path):
+    """
+    Moves the single-file master_*.parquet masters into the partitioned store.
+    The legacy files are kept as they are, but are never read again once the
+    store directory exists.
+
+    Returns:
+        bool: True if legacy files were found and migrated.
+    """
+    legacy_files = [os.path.join(path, f"master_{table}.parquet") for table in MASTER_TABLES]
+    if not all(os.path.exists(legacy_file) for legacy_file in legacy_files):
+        return False
+
+    users_df, models_df, tools_df = (pd.read_parquet(legacy_file) for legacy_file in legacy_files)
+    save_master_dataframes(users_df, models_df, tools_df, path)
+    return True
+
+
+def _read_partitions(path, table, weeks=None, columns=None):
+    """
+    Reads and concatenates the weekly partitions of one master table (all of them by default).
+    Files are memory-mapped and only the requested columns are decoded.
+    """
+    columns = columns or MASTER_COLS[table]
+    if weeks is None:
+        partition_files = sorted(glob.glob(os.path.join(_partition_dir(path, table), '*.parquet')))
+    else:
+        partition_files = [_partition_file(path, table, week) for week in weeks]
+        partition_files = [partition_file for partition_file in partition_files if os.path.exists(partition_file)]
+    if not partition_files:
+        return apply_master_schema(pd.DataFrame(), columns)
+    return concat_master_frames(
+        [pq.read_table(partition_file, columns=columns, memory_map=True).to_pandas() for partition_file in partition_files],
+        columns
+    )
 
 
 def load_master_dataframes(path='.'):
     """
-    Loads the master DataFrames from Parquet files if they exist. If they don't,
-    it calls initialize_master_dataframes() to start fresh.
+    Loads the master DataFrames from the week-partitioned store. On the first run
+    after upgrading, the legacy single-file masters are migrated into the store.
+    If there is no data at all, initialize_master_dataframes() is used to start fresh.
 
     Args:
         path (str): The directory where the files are stored.
@@ -64,42 +370,406 @@ def load_master_dataframes(path='.'):
     Returns:
         tuple: A tuple containing the three master (users, models, tools) DataFrames.
     """
-    try:
-        users_df = pd.read_parquet(os.path.join(path, 'master_users.parquet'))
-        models_df = pd.read_parquet(os.path.join(path, 'master_models.parquet'))
-        tools_df = pd.read_parquet(os.path.join(path, 'master_tools.parquet'))
-        return users_df, models_df, tools_df
-    except FileNotFoundError:
-        # If files don't exist, it's the first run.
+    if not os.path.isdir(os.path.join(path, MASTER_DIR)) and not _migrate_legacy_master_files(path):
+        # If there is neither a store nor legacy files, it's the first run.
         return initialize_master_dataframes()
 
+    return tuple(
+        _read_partitions(path, table) for table in MASTER_TABLES
+    )
+
+
+def load_week_partitions(weeks, path='.', columns=None):
+    """
+    Loads only the given weeks, and optionally only some columns, from the master store.
+
+    Args:
+        weeks (list): The week_start values to load.
+        path (str): The directory where the files are stored.
+        columns (dict): The columns to load per table (all MASTER_COLS by default).
+
+    Returns:
+        tuple: A tuple containing the (users, models, tools) DataFrames of those weeks.
+    """
+    columns = columns or {}
+    return tuple(
+        _read_partitions(path, table, weeks, columns.get(table)) for table in MASTER_TABLES
+    )
+
+
+def open_master_store(path='.'):
+    """
+    Opens the master store without reading any data, migrating the legacy
+    single-file masters first if needed.
+
+    Args:
+        path (str): The directory where the files are stored.
+
+    Returns:
+        list: The sorted week_start Timestamps in the store.
+    """
+    if not os.path.isdir(os.path.join(path, MASTER_DIR)):
+        _migrate_legacy_master_files(path)
+    return list_stored_weeks(path)
+
+
+def week_modified_time(week, path='.'):
+    """
+    Returns the last modification time of a week's partitions, or None if the week
+    is not in the master store.
+
+    Args:
+        week (datetime-like): The week_start of the partitions.
+        path (str): The directory where the files are stored.
+
+    Returns:
+        float: The latest modification timestamp of the week's partition files.
+    """
+    partition_files = [_partition_file(path, table, week) for table in MASTER_TABLES]
+    mtimes = [os.path.getmtime(partition_file) for partition_file in partition_files if os.path.exists(partition_file)]
+    return max(mtimes) if mtimes else None
+
+
+def partition_mtimes(path='.'):
+    """
+    Lists the partition files of the master store with their modification times,
+    without reading any data, e.g. to notice writes by other processes.
+
+    Args:
+        path (str): The directory where the files are stored.
+
+    Returns:
+        dict: The modification time (in ns) of every partition file, by (table, week) where
+            week is the file's name ('YYYY-MM-DD' or 'undated').
+    """
+    mtimes = {}
+    for table in MASTER_TABLES:
+        try:
+            entries = list(os.scandir(_partition_dir(path, table)))
+        except FileNotFoundError:
+            continue
+        for entry in entries:
+            if entry.name.endswith('.parquet'):
+                try:
+                    mtimes[(table, entry.name[:-len('.parquet')])] = entry.stat().st_mtime_ns
+                except FileNotFoundError:
+                    pass  # Removed in the meantime
+    return mtimes
+
+
+def initialize_user_dimension():
+    """
+    Creates an empty user dimension table.
+
+    Returns:
+        pd.DataFrame: The empty user dimension, with the USER_DIM_COLS columns.
+    """
+    return apply_master_schema(pd.DataFrame(), USER_DIM_COLS)
+
+
+def latest_user_names(users_df, models_df, tools_df):
+    """
+    Finds the name of every user in the given master frames: the name of their
+    latest week, where a users row wins over the usage rows of the same week.
+    Undated rows count as older than any week.
+
+    Args:
+        users_df (pd.DataFrame): Users rows with week_start, email and name columns.
+        models_df (pd.DataFrame): Models rows with week_start, email and name columns.
+        tools_df (pd.DataFrame): Tools rows with week_start, email and name columns.
+
+    Returns:
+        pd.DataFrame: One (email, name, name_week) row per user, name_week being the week the name comes from.
+    """
+    # The latest row of each frame first, so only one row per user and frame is converted to objects
+    latest = [
+        df[['week_start', 'email', 'name']]
+        .sort_values('week_start', kind='stable', na_position='first')
+        .drop_duplicates('email', keep='last')
+        .astype({'email': object, 'name': object})
+        .assign(_rank=rank)
+        for rank, df in enumerate((models_df, tools_df, users_df))
+    ]
+    names = pd.concat(latest, ignore_index=True).sort_values(
+        ['week_start', '_rank'], kind='stable', na_position='first'
+    ).drop_duplicates('email', keep='last')
+    return names.rename(columns={'week_start': 'name_week'})[['email', 'name', 'name_week']].reset_index(drop=True)
+
+
+def normalize_master_frames(users_df, models_df, tools_df, user_dim, cohorts):
+    """
+    Moves email and name out of the given master frames into the user dimension,
+    and keys the frames by the integer user_id instead. Users seen for the first
+    time are appended to the dimension; returning users get the name of the new
+    rows unless their current name comes from a more recent week.
+
+    Args:
+        users_df (pd.DataFrame): Users rows with the USER_COLS columns.
+        models_df (pd.DataFrame): Models rows with the MODEL_COLS columns.
+        tools_df (pd.DataFrame): Tools rows with the TOOL_COLS columns.
+        user_dim (pd.DataFrame): The current user dimension.
+        cohorts (dict): The cohort definitions, used for the cohort flags.
+
+    Returns:
+        tuple: The updated user dimension and the (users, models, tools) fact
+            DataFrames with the FACT_COLS columns.
+    """
+    frames = (users_df, models_df, tools_df)
+
+    # --- 1. One (email, name) pair per user: the latest row wins ---
+    seen = latest_user_names(users_df, models_df, tools_df)
+
+    # --- 2. Extend the dimension with new users and refresh returning users' names ---
+    emails = user_dim['email'].astype(object).to_numpy()
+    names = user_dim['name'].astype(object).to_numpy(copy=True)
+    name_weeks = user_dim['name_week'].to_numpy(copy=True)
+    positions = pd.Index(emails).get_indexer(seen['email'])
+    known = positions >= 0
+    # Backfilling an older week must not overwrite a newer name (undated rows being the oldest)
+    incoming_weeks = seen['name_week'].to_numpy()[known]
+    current_weeks = name_weeks[positions[known]]
+    newer = np.isnat(current_weeks) | (~np.isnat(incoming_weeks) & (incoming_weeks >= current_weeks))
+    names[positions[known][newer]] = seen['name'].to_numpy()[known][newer]
+    name_weeks[positions[known][newer]] = incoming_weeks[newer]
+    new_users = seen[~known]
+    user_dim = pd.DataFrame({
+        'user_id': np.arange(len(emails) + len(new_users)),
+        'email': np.concatenate([emails, new_users['email'].to_numpy()]),
+        'name': np.concatenate([names, new_users['name'].to_numpy()]),
+        'name_week': np.concatenate([name_weeks, new_users['name_week'].to_numpy()]),
+    })
+    user_dim['cohorts'] = cohort_flags(user_dim['email'], cohorts)
+    user_dim = apply_master_schema(user_dim, USER_DIM_COLS)
+
+    # --- 3. Key the facts by user_id, mapping each email category only once, and copy the cohort flags ---
+    email_index = pd.Index(user_dim['email'].cat.categories)
+    email_to_user_id = np.empty(len(email_index), dtype='int32')
+    email_to_user_id[user_dim['email'].cat.codes.to_numpy()] = user_dim['user_id'].to_numpy()
+    facts = []
+    for table, df in zip(MASTER_TABLES, frames):
+        email = df['email'].astype('category')
+        category_ids = email_to_user_id[email_index.get_indexer(email.cat.categories)]
+        user_ids = category_ids[email.cat.codes.to_numpy()]
+        fact = df.assign(user_id=user_ids, cohorts=user_dim['cohorts'].to_numpy()[user_ids])
+        facts.append(apply_master_schema(fact, FACT_COLS[table]))
+
+    return (user_dim, *facts)
+
+
+def refresh_user_names(user_dim, users_df, models_df, tools_df, weeks, path='.'):
+    """
+    Recomputes the names that came from replaced or deleted weeks, from the latest
+    remaining week of each of those users. The facts carry no names, so those
+    weeks' partitions are read back (name columns only) from the master store.
+
+    Args:
+        user_dim (pd.DataFrame): The user dimension.
+        users_df (pd.DataFrame): The users fact table, without the removed weeks.
+        models_df (pd.DataFrame): The models fact table, without the removed weeks.
+        tools_df (pd.DataFrame): The tools fact table, without the removed weeks.
+        weeks (list): The week_start values that were replaced or deleted (NaT for the undated rows).
+        path (str): The directory holding the master store.
+
+    Returns:
+        pd.DataFrame: The user dimension, with the names of the affected users recomputed
+            (or missing, for users without any rows left).
+    """
+    weeks = pd.to_datetime(list(weeks))
+    affected = user_dim['name_week'].isin(weeks.dropna())
+    if weeks.isna().any():
+        affected |= user_dim['name_week'].isna()
+    if not affected.any():
+        return user_dim
+
+    # The latest remaining week of each affected user, in any of the fact tables
+    # (NaT for users with only undated rows left)
+    user_ids = user_dim['user_id'][affected].to_numpy()
+    remaining = pd.concat(
+        [df.loc[np.isin(df['user_id'].to_numpy(), user_ids), ['user_id', 'week_start']] for df in (users_df, models_df, tools_df)],
+        ignore_index=True
+    )
+    read_weeks = list(pd.unique(remaining.groupby('user_id')['week_start'].max()))
+
+    # Read the names of those weeks back, restricted to the affected users
+    name_columns = {table: ['week_start', 'email', 'name'] for table in MASTER_TABLES}
+    emails = user_dim['email'][affected].astype(object)
+    frames = [df[df['email'].isin(emails)] for df in load_week_partitions(read_weeks, path, name_columns)]
+    seen = latest_user_names(*frames).set_index('email').reindex(emails.to_numpy())
+
+    names = user_dim['name'].astype(object).to_numpy(copy=True)
+    name_weeks = user_dim['name_week'].to_numpy(copy=True)
+    names[affected.to_numpy()] = seen['name'].to_numpy()
+    name_weeks[affected.to_numpy()] = seen['name_week'].to_numpy()
+    return apply_master_schema(user_dim.assign(name=names, name_week=name_weeks), USER_DIM_COLS)
+
+
+def attach_user_columns(fact_df, user_dim, columns):
+    """
+    Looks up email and name for a fact DataFrame keyed by user_id, for UI-facing views.
+
+    Args:
+        fact_df (pd.DataFrame): A users, models or tools fact DataFrame.
+        user_dim (pd.DataFrame): The user dimension the facts are keyed on.
+        columns (list): The view columns to return (USER_COLS, MODEL_COLS or TOOL_COLS).
+
+    Returns:
+        pd.DataFrame: The DataFrame with email and name columns instead of user_id.
+    """
+    user_ids = fact_df['user_id'].to_numpy()
+    lookups = {
+        col: pd.Categorical.from_codes(user_dim[col].cat.codes.to_numpy()[user_ids], dtype=user_dim[col].dtype)
+        for col in ('email', 'name')
+    }
+    return fact_df.assign(**lookups)[columns]
+
+
+def load_master_data(path='.', cohorts=None):
+    """
+    Loads the master store and normalizes it into the user dimension and the
+    three fact tables keyed by user_id.
+
+    Args:
+        path (str): The directory where the files are stored.
+        cohorts (dict): The cohort definitions (loaded from `path` by default).
+
+    Returns:
+        tuple: The user dimension and the (users, models, tools) fact DataFrames.
+    """
+    return normalize_master_frames(
+        *load_master_dataframes(path), initialize_user_dimension(), load_cohorts(path) if cohorts is None else cohorts
+    )
+
+
+def list_stored_weeks(path='.'):
+    """
+    Lists the weeks present in the master store without reading any data.
+
+    Args:
+        path (str): The directory where the files are stored.
+
+    Returns:
+        list: The sorted week_start Timestamps that have a users partition.
+    """
+    partition_files = glob.glob(os.path.join(_partition_dir(path, 'users'), '*.parquet'))
+    names = [os.path.basename(partition_file)[:-len('.parquet')] for partition_file in partition_files]
+    return sorted(pd.to_datetime(name) for name in names if name != 'undated')
+
+
+def parse_report_date(filename):
+    """
+    Extracts the report date from an export filename such as
+    "ChatGPT Enterprise Users 2025-03-23.csv".
+
+    Args:
+        filename (str): The name of the uploaded file.
+
+    Returns:
+        pd.Timestamp: The report date.
+
+    Raises:
+        ValueError: If the filename does not end with a YYYY-MM-DD date.
+    """
+    report_date_str = os.path.basename(filename).split(' ')[-1].replace('.csv', '')
+    return pd.to_datetime(datetime.strptime(report_date_str, '%Y-%m-%d'))
+
+
+def _parse_dict_cell(cell):
+    """
+    Parses a single dictionary-like string with ast.literal_eval.
+    Used as the fallback for cells the bulk parser cannot handle.
+
+    Returns:
+        dict or None: The parsed dictionary, or None if the cell is malformed.
+    """
+    try:
+        parsed = ast.literal_eval(cell)
+    except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError):
+        return None
+    return parsed if isinstance(parsed, dict) else None
+
 
 def _flatten_data(df, id_vars, col_to_flatten, new_col_names):
     """
     A helper function to flatten columns that contain dictionary-like strings.
     It unnests the data into a tidy format.
+
+    Well-formed cells (e.g. "{'gpt-4o': 20, 'o3': 6}") are parsed in bulk with
+    Arrow string kernels, without creating a Python object per row. Any other
+    cell falls back to ast.literal_eval, and cells that still cannot be parsed
+    are skipped. The number of skipped cells is reported in the result's
+    `attrs['skipped_cells']`.
     """
+    empty = pd.DataFrame(columns=id_vars + new_col_names)
+    empty.attrs['skipped_cells'] = 0
+
     # Drop rows where the column to flatten or the user email is missing
     df = df.dropna(subset=id_vars + [col_to_flatten])
-    
+
     # Filter out non-dictionary or empty values (e.g., '0' or NaN)
-    df = df[df[col_to_flatten].astype(str).str.startswith('{')]
-    
+    cells = df[col_to_flatten].astype(str)
+    is_dict = cells.str.startswith('{')
+    df = df[is_dict].reset_index(drop=True)
+    cells = cells[is_dict].reset_index(drop=True)
+
     if df.empty:
-        return pd.DataFrame(columns=id_vars + new_col_names)
+        return empty
 
-    # Use ast.literal_eval to safely convert the string to a dictionary
-    df[col_to_flatten] = df[col_to_flatten].apply(ast.literal_eval)
-    
-    records = []
-    for _, row in df.iterrows():
-        for key, value in row[col_to_flatten].items():
-            record = {var: row[var] for var in id_vars}
-            record[new_col_names[0]] = key
-            record[new_col_names[1]] = value
-            records.append(record)
-            
-    return pd.DataFrame(records) if records else pd.DataFrame(columns=id_vars + new_col_names)
+    # --- 1. Bulk path: parse every well-formed cell at once with Arrow compute kernels ---
+    arrow_cells = pa.array(cells, type=pa.string())
+    well_formed = pc.match_substring_regex(arrow_cells, _DICT_CELL_PATTERN)
+    valid_rows = pc.indices_nonzero(well_formed)
+    bodies = pc.utf8_slice_codeunits(pc.take(arrow_cells, valid_rows), 1, -1)
+    entries = pc.split_pattern_regex(bodies, r"\s*,\s*")
+    parsed = pc.extract_regex(pc.utf8_trim_whitespace(pc.list_flatten(entries)), _DICT_ENTRY_PATTERN)
+
+    # Empty dicts and trailing commas leave empty entries behind, which don't match
+    matched = pc.is_valid(parsed)
+    parsed = parsed.filter(matched)
+    rows = pc.take(valid_rows, pc.list_parent_indices(entries).filter(matched))
+    parts = [pd.DataFrame({
+        '_row': rows.to_numpy(),
+        new_col_names[0]: pc.utf8_slice_codeunits(parsed.field('key'), 1, -1).to_pandas(),
+        new_col_names[1]: pc.cast(parsed.field('value'), pa.int64()).to_numpy(),
+    })]
+
+    # --- 2. Fallback path: parse the remaining cells one by one ---
+    skipped_cells = 0
+    fallback_records = []
+    for row, cell in cells[~well_formed.to_numpy(zero_copy_only=False)].items():
+        parsed_cell = _parse_dict_cell(cell)
+        if parsed_cell is None:
+            skipped_cells += 1
+            continue
+        for key, value in parsed_cell.items():
+            fallback_records.append((row, key, value))
+
+    if fallback_records:
+        # Interleave both paths so the output keeps the original row order
+        parts.append(pd.DataFrame(fallback_records, columns=['_row'] + new_col_names))
+        flat = pd.concat(parts, ignore_index=True).sort_values('_row', kind='stable')
+    else:
+        flat = parts[0]
+
+    # A repeated key keeps its first position and its last value, exactly like a Python dict would
+    keys = ['_row', new_col_names[0]]
+    if flat.duplicated(keys).any():
+        group = flat.groupby(keys, sort=False, dropna=False).ngroup().to_numpy()
+        is_last = ~flat.duplicated(keys, keep='last').to_numpy()
+        last_values = pd.Series(flat[new_col_names[1]].to_numpy()[is_last], index=group[is_last])
+        flat = flat.assign(**{new_col_names[1]: last_values.reindex(group).to_numpy()})
+        flat = flat[~flat.duplicated(keys, keep='first')]
+
+    if flat.empty:
+        empty.attrs['skipped_cells'] = skipped_cells
+        return empty
+
+    # Broadcast the id columns of each source row onto its flattened entries
+    rows = flat['_row'].to_numpy()
+    result = df[id_vars].take(rows).reset_index(drop=True)
+    result[new_col_names[0]] = flat[new_col_names[0]].to_numpy()
+    result[new_col_names[1]] = flat[new_col_names[1]].to_numpy()
+    result.attrs['skipped_cells'] = skipped_cells
+    return result
 
 
 def process_uploaded_file(df, filename):
@@ -124,15 +794,10 @@ def process_uploaded_file(df, filename):
 
     numeric_cols = ['messages', 'gpts_messaged', 'tools_messaged', 'projects_created']
     for col in numeric_cols:
-        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype(int)
-
-    df['is_active'] = df['is_active'].astype('bool')
-    df['user_status'] = df['user_status'].astype('category')
-
-    
+        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
 
     # --- 2. Create the User Details DataFrame ---
-    users_df = df.reindex(columns=USER_COLS).copy()
+    users_df = apply_master_schema(df, USER_COLS)
 
     # --- 3. Create the Model and Tool Usage DataFrames ---
     id_vars = ['week_start', 'email', 'name']
@@ -140,10 +805,59 @@ def process_uploaded_file(df, filename):
     tools_df = _flatten_data(df, id_vars, 'tool_to_messages', ['tool', 'messages'])
     
     # Ensure correct data types for the flattened frames
-    if not models_df.empty:
-        models_df['messages'] = pd.to_numeric(models_df['messages'], errors='coerce').fillna(0).astype(int)
+    models_df['messages'] = pd.to_numeric(models_df['messages'], errors='coerce').fillna(0)
+    tools_df['messages'] = pd.to_numeric(tools_df['messages'], errors='coerce').fillna(0)
+    models_df = apply_master_schema(models_df, MODEL_COLS)
+    tools_df = apply_master_schema(tools_df, TOOL_COLS)
+
+    return users_df, models_df, tools_df
+
+
+def process_csv_in_chunks(source, path='.', chunksize=STREAMING_CHUNK_ROWS):
+    """
+    Streaming variant of process_uploaded_file() for very large exports.
+    The CSV is read in chunks of `chunksize` rows, and each chunk is processed and
+    appended to the week partitions of the master store right away, so peak memory
+    depends on the chunk size instead of the file size. The partitions written are
+    identical to saving the output of process_uploaded_file() for the whole file.
+
+    Args:
+        source (str or file-like): The CSV file to ingest.
+        path (str): The directory holding the master store.
+        chunksize (int): The number of CSV rows processed at a time.
+
+    Returns:
+        tuple: The sorted list of weeks written, and the number of skipped usage cells.
+    """
+    writers = {}
+    weeks = set()
+    skipped_cells = 0
+    try:
+        for chunk in pd.read_csv(source, chunksize=chunksize, dtype=_TEXT_COLUMN_DTYPES):
+            for table, df in zip(MASTER_TABLES, process_uploaded_file(chunk, None)):
+                skipped_cells += df.attrs.get('skipped_cells', 0)
+                for week, week_df in df.groupby('week_start', dropna=False):
+                    weeks.add(week)
+                    partition_file = _partition_file(path, table, week)
+                    if partition_file not in writers:
+                        os.makedirs(_partition_dir(path, table), exist_ok=True)
+                        writers[partition_file] = pq.ParquetWriter(
+                            partition_file + '.tmp', MASTER_ARROW_SCHEMAS[table]
+                        )
+                    batch = pa.Table.from_pandas(week_df, schema=MASTER_ARROW_SCHEMAS[table], preserve_index=False)
+                    writers[partition_file].write_table(batch)
+    except Exception:
+        # Leave the store untouched if any chunk fails
+        for partition_file, writer in writers.items():
+            writer.close()
+            os.remove(partition_file + '.tmp')
+        raise
 
-    if not tools_df.empty:
-        tools_df['messages'] = pd.to_numeric(tools_df['messages'], errors='coerce').fillna(0).astype(int)
+    # Only publish the new partitions once the whole file has been processed
+    for partition_file, writer in writers.items():
+        writer.close()
+        os.replace(partition_file + '.tmp', partition_file)
+    for table in MASTER_TABLES:
+        _remove_stale_partitions(path, table, weeks, set(writers))
 
-    return users_df, models_df, tools_df
\ No newline at end of file
+    return sorted(weeks), skipped_cells
@@ -0,0 +1,102 @@
+import hashlib
+import os
+import tempfile
+import time
+import uuid
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# The export formats, with their file extension and MIME type. Arrow IPC uses the
+# stream format, which allows every record batch to carry its own dictionaries.
+EXPORT_FORMATS = {
+    'Parquet': ('.parquet', 'application/vnd.apache.parquet'),
+    'Arrow IPC': ('.arrows', 'application/vnd.apache.arrow.stream'),
+}
+
+# Views are converted and written this many rows at a time, so the memory used
+# to write an export does not grow with the size of the view. Serving the file is
+# another matter: Streamlit's downloads hold the whole file in memory.
+EXPORT_BATCH_ROWS = 64 * 1024
+
+# Finished exports are kept here, named after the view they were written from,
+# and removed once they are older than EXPORT_MAX_AGE_SECONDS
+EXPORT_DIR = os.path.join(tempfile.gettempdir(), 'usage-analytics-exports')
+EXPORT_MAX_AGE_SECONDS = 24 * 60 * 60
+
+# Data versions restart with every process, so export names include this process's token too
+_PROCESS_TOKEN = uuid.uuid4().hex
+
+
+def iter_record_batches(df, batch_rows=EXPORT_BATCH_ROWS):
+    """
+    Converts a DataFrame to Arrow record batches, one slice of rows at a time.
+
+    Args:
+        df (pd.DataFrame): The view to convert.
+        batch_rows (int): The number of rows per batch.
+
+    Yields:
+        pa.RecordBatch: The batches, all with the same schema.
+    """
+    schema = pa.Schema.from_pandas(df.iloc[:0], preserve_index=False)
+    for start in range(0, len(df), batch_rows):
+        yield pa.RecordBatch.from_pandas(df.iloc[start:start + batch_rows], schema=schema, preserve_index=False)
+
+
+def write_export(df, export_format, sink, batch_rows=EXPORT_BATCH_ROWS):
+    """
+    Writes a view as Parquet or Arrow IPC, one record batch at a time.
+
+    Args:
+        df (pd.DataFrame): The view to export.
+        export_format (str): One of EXPORT_FORMATS.
+        sink (str or file-like): The file to write to.
+        batch_rows (int): The number of rows per batch (and Parquet row group).
+    """
+    schema = pa.Schema.from_pandas(df.iloc[:0], preserve_index=False)
+    if export_format == 'Parquet':
+        writer = pq.ParquetWriter(sink, schema)
+    elif export_format == 'Arrow IPC':
+        writer = pa.ipc.new_stream(sink, schema)
+    else:
+        raise ValueError(f"Unknown export format: {export_format}")
+    with writer:
+        for batch in iter_record_batches(df, batch_rows):
+            writer.write_batch(batch)
+
+
+def export_view(df, export_format, view_key):
+    """
+    Exports a view to a file, reusing an earlier export of the same view. The file
+    is written next to its final name first, so a reader never sees a partial export.
+
+    Args:
+        df (pd.DataFrame): The view to export.
+        export_format (str): One of EXPORT_FORMATS.
+        view_key (tuple): Identifies the view, including the data version.
+
+    Returns:
+        str: The path of the exported file.
+    """
+    extension, _ = EXPORT_FORMATS[export_format]
+    name = hashlib.sha256(repr((_PROCESS_TOKEN, export_format) + tuple(view_key)).encode()).hexdigest()[:32]
+    export_file = os.path.join(EXPORT_DIR, name + extension)
+    if not os.path.exists(export_file):
+        os.makedirs(EXPORT_DIR, exist_ok=True)
+        _remove_old_exports()
+        temp_file = f"{export_file}.{os.getpid()}.tmp"
+        write_export(df, export_format, temp_file)
+        os.replace(temp_file, export_file)
+    return export_file
+
+
+def _remove_old_exports():
+    """Removes exports older than EXPORT_MAX_AGE_SECONDS."""
+    cutoff = time.time() - EXPORT_MAX_AGE_SECONDS
+    for entry in os.scandir(EXPORT_DIR):
+        try:
+            if entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+        except FileNotFoundError:
+            pass  # Removed by another session in the meantime
@@ -0,0 +1,259 @@
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from core.data import (
+    process_uploaded_file, parse_report_date, concat_master_frames, save_week_partitions, copy_week_partitions,
+    MASTER_COLS, MASTER_TABLES
+)
+
+# Processed exports are kept by content hash, each as a small master store of its own:
+# .ingest_cache/<sha256>/master/<table>/<week>.parquet
+INGEST_CACHE_DIR = '.ingest_cache'
+
+# The total size of the cached partitions, above which the least recently used files
+# are evicted, and the time after which an unused file is evicted in any case. Only the
+# partition copies are removed: the manifest keeps recognizing the files that back the
+# master store, so uploading one of them again is still a no-op.
+INGEST_CACHE_MAX_BYTES = 512 * 1024 * 1024
+INGEST_CACHE_MAX_AGE_SECONDS = 90 * 24 * 60 * 60
+
+
+def file_digest(source):
+    """
+    Computes the SHA-256 of an export's bytes, reading files in blocks.
+
+    Args:
+        source (str, bytes or file-like): The path of the CSV file, its raw contents, or an open binary file.
+
+    Returns:
+        str: The hex digest.
+    """
+    if isinstance(source, bytes):
+        return hashlib.sha256(source).hexdigest()
+    if isinstance(source, str):
+        with open(source, 'rb') as f:
+            return file_digest(f)
+
+    digest = hashlib.sha256()
+    source.seek(0)
+    for block in iter(lambda: source.read(1024 * 1024), b''):
+        digest.update(block)
+    source.seek(0)
+    return digest.hexdigest()
+
+
+def _week_key(week):
+    """Returns the manifest key of a week, named like its partition files."""
+    return 'undated' if pd.isna(week) else pd.Timestamp(week).strftime('%Y-%m-%d')
+
+
+def _parse_week_key(key):
+    return pd.NaT if key == 'undated' else pd.Timestamp(key)
+
+
+def _directory_size(directory):
+    """Returns the total size of the files under a directory, in bytes."""
+    return sum(
+        os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(directory) for name in names
+    )
+
+
+class IngestCache:
+    """
+    Content-addressed cache of ingested exports. The processed output of every
+    file is kept under the SHA-256 of its bytes, and a manifest records which
+    file currently backs each week of the master store. Uploading identical bytes
+    again is a no-op whatever the filename, and a file seen before (e.g. for a
+    week that was deleted since) is restored without being parsed again. The
+    manifest records when each file was last stored or restored: once the cache
+    exceeds `max_bytes`, the partitions of the least recently used files are
+    evicted first, and those unused for longer than `max_age_seconds` are evicted
+    in any case.
+    """
+
+    def __init__(self, path='.', max_bytes=INGEST_CACHE_MAX_BYTES, max_age_seconds=INGEST_CACHE_MAX_AGE_SECONDS):
+        self.path = path
+        self.root = os.path.join(path, INGEST_CACHE_DIR)
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self._manifest_file = os.path.join(self.root, 'manifest.json')
+        try:
+            with open(self._manifest_file) as f:
+                self.manifest = json.load(f)
+        except FileNotFoundError:
+            self.manifest = {'files': {}, 'weeks': {}}
+
+    def _save(self):
+        os.makedirs(self.root, exist_ok=True)
+        # Write to a temporary file first so the manifest is never left half-written
+        with open(self._manifest_file + '.tmp', 'w') as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(self._manifest_file + '.tmp', self._manifest_file)
+
+    def is_current(self, digest):
+        """Returns True if every week of this file is still backed by exactly these bytes."""
+        weeks = self.manifest['files'].get(digest, {}).get('weeks')
+        return bool(weeks) and all(self.manifest['weeks'].get(week) == digest for week in weeks)
+
+    def contains(self, digest):
+        """Returns True if the processed output of this file is in the cache."""
+        return digest in self.manifest['files'] and os.path.isdir(os.path.join(self.root, digest))
+
+    def store(self, digest, filename, weeks):
+        """Copies the freshly written partitions of a file's weeks into the cache."""
+        copy_week_partitions(weeks, self.path, os.path.join(self.root, digest))
+        self.manifest['files'][digest] = {
+            'filename': filename, 'weeks': [_week_key(week) for week in weeks], 'used': time.time()
+        }
+        self._evict(keep=digest)
+        self._save()
+
+    def restore(self, digest):
+        """Copies a cached file's partitions back into the master store and returns its weeks."""
+        entry = self.manifest['files'][digest]
+        weeks = [_parse_week_key(week) for week in entry['weeks']]
+        copy_week_partitions(weeks, os.path.join(self.root, digest), self.path)
+        # Saved by mark_current(), which always follows
+        entry['used'] = time.time()
+        return weeks
+
+    def mark_current(self, digest, weeks):
+        """Records that these weeks of the master store now come from this file."""
+        for week in weeks:
+            self.manifest['weeks'][_week_key(week)] = digest
+        self._save()
+
+    def forget_week(self, week):
+        """Records that a week was deleted from the master store."""
+        if self.manifest['weeks'].pop(_week_key(week), None) is not None:
+            self._save()
+
+    def _evict(self, keep=None):
+        """
+        Removes expired and least recently used partition copies, except those of `keep`,
+        and forgets the files that no longer back a week.
+        """
+        entries = []
+        now = time.time()
+        for digest, entry in self.manifest['files'].items():
+            cache_dir = os.path.join(self.root, digest)
+            if digest != keep and os.path.isdir(cache_dir):
+                # Manifests written before the last use was recorded fall back to the directory's age
+                used = entry.get('used') or os.path.getmtime(cache_dir)
+                entries.append((used, _directory_size(cache_dir), digest))
+
+        total = sum(size for _, size, _ in entries)
+        for used, size, digest in sorted(entries):
+            if total <= self.max_bytes and now - used <= self.max_age_seconds:
+                break
+            shutil.rmtree(os.path.join(self.root, digest), ignore_errors=True)
+            total -= size
+            if not self.is_current(digest):
+                del self.manifest['files'][digest]
+
+
+def _process_export(filename, source):
+    """
+    Reads and processes a single export inside a worker process.
+
+    Args:
+        filename (str): The name of the export, passed on to process_uploaded_file().
+        source (str or bytes): The path of the CSV file, or its raw contents.
+
+    Returns:
+        tuple: The processed (users, models, tools) DataFrames.
+    """
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    return process_uploaded_file(pd.read_csv(source), filename)
+
+
+def ingest_files(sources, path='.', max_workers=None):
+    """
+    Ingests many weekly exports into the master store. Files whose bytes already
+    back the store are skipped, files seen before are restored from the ingest
+    cache, and the rest are processed in parallel across a pool of worker
+    processes (one per report date of the batch). Their weeks are then committed
+    in a single write, replacing any existing data for those weeks.
+
+    Args:
+        sources (list): (filename, path or bytes) pairs, one per export.
+        path (str): The directory holding the master store.
+        max_workers (int): The number of worker processes (defaults to the CPU count).
+
+    Returns:
+        tuple: The sorted weeks that were written, and a report dict with the
+            'processed', 'restored', 'unchanged', 'duplicates' and 'failed'
+            filenames and the total number of 'skipped_cells'.
+    """
+    report = {'processed': [], 'restored': [], 'unchanged': [], 'duplicates': [], 'failed': [], 'skipped_cells': 0}
+    cache = IngestCache(path)
+    written_weeks = set()
+
+    # --- 1. Skip or restore files by content, and dedupe the rest by filename date ---
+    seen_dates = set()
+    to_process = []
+    for filename, source in sources:
+        try:
+            digest = file_digest(source)
+            if cache.is_current(digest):
+                report['unchanged'].append(filename)
+                continue
+            if cache.contains(digest):
+                weeks = cache.restore(digest)
+                cache.mark_current(digest, weeks)
+                written_weeks.update(weeks)
+                report['restored'].append(filename)
+                continue
+            report_date = parse_report_date(filename)
+        except (OSError, ValueError) as e:
+            report['failed'].append((filename, str(e)))
+            continue
+        if report_date in seen_dates:
+            report['duplicates'].append(filename)
+            continue
+        seen_dates.add(report_date)
+        to_process.append((filename, source, digest))
+
+    # --- 2. Process the remaining files in parallel ---
+    results = {}
+    if to_process:
+        max_workers = min(max_workers or os.cpu_count() or 1, len(to_process))
+        # Spawned rather than forked, as the server process runs many threads that may hold locks
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+            futures = {
+                executor.submit(_process_export, filename, source): filename
+                for filename, source, _ in to_process
+            }
+            for future in as_completed(futures):
+                filename = futures[future]
+                try:
+                    results[filename] = future.result()
+                except Exception as e:
+                    report['failed'].append((filename, str(e)))
+
+    # --- 3. Commit all processed weeks in a single write, then cache each file's output ---
+    processed = [(filename, digest, results[filename]) for filename, _, digest in to_process if filename in results]
+    if processed:
+        combined = []
+        for table, frames in zip(MASTER_TABLES, zip(*(frames for _, _, frames in processed))):
+            report['skipped_cells'] += sum(df.attrs.get('skipped_cells', 0) for df in frames)
+            combined.append(concat_master_frames(frames, MASTER_COLS[table]))
+        save_week_partitions(*combined, path)
+
+        for filename, digest, (users_df, _, _) in processed:
+            weeks = list(pd.to_datetime(users_df['week_start'].unique()))
+            cache.store(digest, filename, weeks)
+            cache.mark_current(digest, weeks)
+            written_weeks.update(weeks)
+            report['processed'].append(filename)
+
+    return sorted(written_weeks, key=_week_key), report
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+
+# The KPIs in display order. They are computed for every week, as a tidy series
+# with one row per week and KPI (see KPI_COLS).
+KPIS = [
+    'total_users', 'active_users', 'total_messages', 'avg_messages_per_user',
+    'models_used', 'top_model_share', 'tools_used', 'tool_messages',
+]
+KPI_COLS = ['week_start', 'kpi', 'value', 'change']
+
+# KPIs that are already percentages. Their change is the difference in points
+# rather than a percentage of a percentage.
+SHARE_KPIS = {'top_model_share'}
+
+
+def _usage_kpis(rollup, key):
+    """Aggregates a models or tools rollup into per-week usage KPIs in one grouped pass."""
+    used = rollup[rollup['messages'] > 0]
+    weekly = used.groupby('week_start').agg(
+        used=(key, 'nunique'), messages=('messages', 'sum'), top=('messages', 'max')
+    )
+    return pd.DataFrame({
+        f"{key}s_used": weekly['used'],
+        f"{key}_messages": weekly['messages'],
+        f"top_{key}_share": weekly['top'] / weekly['messages'] * 100,
+    })
+
+
+def compute_kpi_series(users_rollup, models_rollup, tools_rollup):
+    """
+    Computes every KPI for every week of the given rollups, with the change from
+    the previous week. Each rollup table is aggregated in a single grouped pass,
+    so the cost depends on the number of weeks only.
+
+    Args:
+        users_rollup (pd.DataFrame): The users rollup rows of one cohort and date range.
+        models_rollup (pd.DataFrame): The models rollup rows of the same selection.
+        tools_rollup (pd.DataFrame): The tools rollup rows of the same selection.
+
+    Returns:
+        pd.DataFrame: The KPI_COLS series, sorted by KPI (in KPIS order) and week.
+            `change` is NaN for the first week of each KPI.
+    """
+    if users_rollup.empty:
+        return pd.DataFrame(columns=KPI_COLS)
+
+    weekly = users_rollup.groupby('week_start')[['total_users', 'active_users', 'total_messages']].sum()
+    weekly['avg_messages_per_user'] = (
+        weekly['total_messages'] / weekly['total_users'].where(weekly['total_users'] > 0)
+    ).fillna(0)
+    weekly = weekly.join(_usage_kpis(models_rollup, 'model')).join(_usage_kpis(tools_rollup, 'tool'))
+    weekly = weekly.reindex(columns=KPIS).fillna(0).astype(float).sort_index()
+
+    # Week-over-week changes of all KPIs at once. A KPI growing from zero counts as +100%.
+    previous = weekly.shift(1)
+    change = (weekly - previous) / previous.where(previous != 0) * 100
+    change = change.mask(previous == 0, np.where(weekly > 0, 100.0, 0.0))
+    shares = list(SHARE_KPIS)
+    change[shares] = weekly[shares] - previous[shares]
+
+    series = weekly.rename_axis('week_start').reset_index().melt(id_vars='week_start', var_name='kpi')
+    series['change'] = change.to_numpy().ravel(order='F')
+    series['kpi'] = pd.Categorical(series['kpi'], categories=KPIS, ordered=True)
+    return series.sort_values(['kpi', 'week_start'], ignore_index=True).reindex(columns=KPI_COLS)
@@ -0,0 +1,149 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+# Generated code is kept as one small JSON file per response: .llm_cache/<sha256>.json
+LLM_CACHE_DIR = '.llm_cache'
+
+# The total size of the cached responses, above which the least recently used ones
+# are evicted, and the age after which a response is generated again.
+LLM_CACHE_MAX_BYTES = 20 * 1024 * 1024
+LLM_CACHE_MAX_AGE_SECONDS = 30 * 24 * 60 * 60
+
+
+def schema_fingerprint(df):
+    """
+    Identifies the schema of a DataFrame (column names and dtypes), so code generated
+    for one view is reused for any view with the same columns, e.g. another cohort.
+
+    Args:
+        df (pd.DataFrame): The DataFrame the code is generated for.
+
+    Returns:
+        str: The hex digest of the schema.
+    """
+    schema = [[str(col), str(dtype)] for col, dtype in df.dtypes.items()]
+    return hashlib.sha256(json.dumps(schema).encode()).hexdigest()
+
+
+def response_key(model, variant, user_request, fingerprint, previous_code=None, feedback=None):
+    """
+    Builds the cache key of an LLM response.
+
+    Args:
+        model (str): The model the response comes from.
+        variant (str): The prompt variant, 'initial' or 'refinement'.
+        user_request (str): The user's visualization request.
+        fingerprint (str): The schema_fingerprint() of the prompted DataFrame.
+        previous_code (str): The code being refined, for refinements.
+        feedback (str): The user's feedback, for refinements.
+
+    Returns:
+        str: The hex digest identifying the response.
+    """
+    parts = [model, variant, user_request, fingerprint, previous_code, feedback]
+    return hashlib.sha256(json.dumps(parts).encode()).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    Disk-backed cache of generated code, shared by all sessions (and processes)
+    using the same directory. A file's modification time records its last use:
+    once the cache exceeds `max_bytes`, the least recently used responses are
+    evicted first, and responses older than `max_age_seconds` are never served.
+    """
+
+    def __init__(self, path='.', max_bytes=LLM_CACHE_MAX_BYTES, max_age_seconds=LLM_CACHE_MAX_AGE_SECONDS):
+        self.root = os.path.join(path, LLM_CACHE_DIR)
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _file(self, key):
+        return os.path.join(self.root, f"{key}.json")
+
+    def get(self, key):
+        """
+        Returns a cached response, or None if it is missing or expired.
+
+        Args:
+            key (str): The response_key() of the request.
+
+        Returns:
+            str: The cached response.
+        """
+        cache_file = self._file(key)
+        try:
+            with open(cache_file) as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            entry = None
+        if entry is not None and time.time() - entry['created'] > self.max_age_seconds:
+            self._remove(cache_file)
+            entry = None
+
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        # Mark the response as recently used
+        try:
+            os.utime(cache_file)
+        except FileNotFoundError:
+            pass  # Evicted by another session in the meantime
+        return entry['response']
+
+    def put(self, key, response):
+        """
+        Caches a response, then evicts expired and least recently used responses.
+
+        Args:
+            key (str): The response_key() of the request.
+            response (str): The generated code.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        cache_file = self._file(key)
+        # Write to a temporary file first so readers never see a partial response
+        temp_file = f"{cache_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_file, 'w') as f:
+            json.dump({'created': time.time(), 'response': response}, f)
+        os.replace(temp_file, cache_file)
+        self._evict()
+
+    def discard(self, key):
+        """Removes a cached response, e.g. code that failed to run, so it is generated again."""
+        self._remove(self._file(key))
+
+    def _evict(self):
+        entries = []
+        now = time.time()
+        for entry in os.scandir(self.root):
+            if not entry.name.endswith('.json'):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            # Responses unused for longer than the maximum age have expired in any case
+            if now - stat.st_mtime > self.max_age_seconds:
+                self._remove(entry.path)
+            else:
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, cache_file in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(cache_file)
+            total -= size
+
+    def _remove(self, cache_file):
+        try:
+            os.remove(cache_file)
+        except FileNotFoundError:
+            pass  # Removed by another session in the meantime
@@ -1,14 +1,23 @@
-import google.generativeai as genai
-import openai
-import io
-import os
-from dotenv import load_dotenv
+import ast
+import asyncio
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from core.llm_cache import schema_fingerprint, response_key
+from core.llm_providers import stream_code, generate_code, MODELS
+from core.prompt_profile import profile_dataframe
 
-load_dotenv()
+# How long each provider may take when several are asked concurrently
+PROVIDER_TIMEOUT_SECONDS = 60
 
-# Load API keys from environment variables
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+# The outcome of one provider in concurrent generation. `error` is None when the
+# code is valid (it parses and assigns `fig`); `seconds` is the time it took.
+GenerationResult = namedtuple('GenerationResult', ['model', 'code', 'error', 'seconds'])
+
+# Runs the blocking provider calls of the async mode. Unlike the event loop's default
+# executor, it is not joined when the loop closes, so a cancelled call never delays the winner.
+_BLOCKING_CALLS = ThreadPoolExecutor(max_workers=8, thread_name_prefix='llm-call')
 
 
 def get_visualization_code(
@@ -16,19 +25,52 @@ def get_visualization_code(
     df_for_prompt, 
     model,
     previous_code=None,
-    feedback=None
+    feedback=None,
+    cache=None,
+    df_profile=None,
+    on_chunk=None
 ):
     """
     Calls the selected LLM API to generate Python code for a visualization.
     If previous_code and feedback are provided, it asks the model to refine the code.
+    If an LLMResponseCache is given, a response for the same model, request, feedback
+    and DataFrame schema is returned from it without calling the API.
+    df_profile is the profile_dataframe() of df_for_prompt, if it was already computed.
+    The response is streamed: on_chunk, if given, is called with the text received so far.
+    """
+    cache_key = None
+    if cache is not None:
+        cache_key = visualization_cache_key(user_request, df_for_prompt, model, previous_code, feedback)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    if df_profile is None:
+        df_profile = profile_dataframe(df_for_prompt)
+    prompt = prompt_for(user_request, df_profile, df_for_prompt.columns.tolist(), previous_code, feedback)
+    response = ""
+    for chunk in stream_code(model, prompt, user_request):
+        response += chunk
+        if on_chunk is not None:
+            on_chunk(response)
+    if cache is not None:
+        cache.put(cache_key, response)
+    return response
+
+
+def visualization_cache_key(user_request, df_for_prompt, model, previous_code=None, feedback=None):
+    """Returns the LLMResponseCache key of a get_visualization_code() request."""
+    if previous_code and feedback:
+        return response_key(model, 'refinement', user_request, schema_fingerprint(df_for_prompt), previous_code, feedback)
+    return response_key(model, 'initial', user_request, schema_fingerprint(df_for_prompt))
+
+
+def prompt_for(user_request, df_profile, df_columns, previous_code=None, feedback=None):
+    """
+    Builds the prompt asking for new visualization code, or for a refinement of previous_code.
+    The DataFrame is described by its token-budgeted profile rather than its full schema and rows.
     """
     # --- Prompt Definition (shared by both models) ---
-    with io.StringIO() as buffer:
-        df_for_prompt.info(buf=buffer)
-        df_schema = buffer.getvalue()
-    df_head = df_for_prompt.head().to_string()
-    df_tail = df_for_prompt.tail().to_string()
-    df_columns = df_for_prompt.columns.tolist()
 
     if previous_code and feedback:
         # This is a refinement request
@@ -36,18 +78,9 @@ def get_visualization_code(
         You are an expert and meticulous Python data analyst specializing in Plotly Express.
         A user wants to refine a visualization you previously created.
 
-        The DataFrame `df` has this schema and head:
-        Schema:
-        ```
-        {df_schema}
-        ```
-        Head:
-        ```
-        {df_head}
+        The DataFrame `df` has this profile (columns, value ranges, most frequent values and a sample):
         ```
-        Tail:
-        ```
-        {df_tail}
+        {df_profile}
         ```
 
         Here is the original user request:
@@ -70,9 +103,10 @@ def get_visualization_code(
         - The final chart object must be assigned to a variable named `fig`.
         - `plotly.express` is already imported as `px`. Do not import it again.
         - Do not include `st.plotly_chart(fig)`. The app will handle rendering.
-        - **ONLY use columns that exist in the DataFrame schema above. Available columns are: {df_columns}**
+        - **ONLY use columns that exist in the DataFrame profile above. Available columns are: {df_columns}**
         - **Handle missing data: Use df.dropna() or df.fillna() as appropriate**
         - **For aggregations, use pandas groupby/agg methods before plotting**
+        - **Text columns such as email, name, model and tool are categorical: always pass observed=True to groupby**
         - **Only use valid Plotly Express function parameters. Common valid parameters include: x, y, color, size, hover_data, title, labels**
         - **For date columns, ensure proper datetime conversion: pd.to_datetime(df['col'], errors='coerce')**
         - **Always include error handling for data operations**
@@ -85,19 +119,9 @@ def get_visualization_code(
         Your goal is to generate clean, readable, and ERROR-FREE Python code for visualizations based on user requests.
         You are working with a pandas DataFrame in memory named `df`.
 
-        Here is the schema of the DataFrame:
-        ```
-        {df_schema}
-        ```
-
-        Here is the head of the DataFrame:
-        ```
-        {df_head}
-        ```
-
-        Here is the tail of the DataFrame:
+        Here is a profile of the DataFrame (columns, value ranges, most frequent values and a sample):
         ```
-        {df_tail}
+        {df_profile}
         ```
 
         The user has requested the following visualization:
@@ -113,9 +137,10 @@ def get_visualization_code(
         - The final chart object must be assigned to a variable named `fig`. For example: `fig = px.bar(...)`
         - `plotly.express` is already imported as `px`. Do not import it again.
         - Do not include `st.plotly_chart(fig)`. The app will handle rendering.
-        - **ONLY use columns that exist in the DataFrame schema above. Available columns are: {df_columns}**
+        - **ONLY use columns that exist in the DataFrame profile above. Available columns are: {df_columns}**
         - **Handle missing data: Use df.dropna() or df.fillna() as appropriate**
         - **For aggregations, use pandas groupby/agg methods before plotting**
+        - **Text columns such as email, name, model and tool are categorical: always pass observed=True to groupby**
         - **Only use valid Plotly Express function parameters. Common valid parameters include: x, y, color, size, hover_data, title, labels**
         - **If a column has mixed data types, convert appropriately: pd.to_numeric(df['col'], errors='coerce')**
         - **For date columns, ensure proper datetime conversion: pd.to_datetime(df['col'], errors='coerce')**
@@ -123,34 +148,138 @@ def get_visualization_code(
         - **If the request cannot be fulfilled with available data, create a simple fallback visualization**
         - **Wrap the main plotting logic in a try-except block and provide a fallback chart if errors occur**
         """
+    return prompt
+
+
+def clean_code(code):
+    """Removes any markdown code fences around generated code."""
+    return code.strip().replace("```python", "").replace("```", "")
+
+
+def validate_visualization_code(code):
+    """
+    Checks generated code without running it: it must be valid Python and assign `fig`.
 
-    # --- API Call Logic ---
-    if model == "Gemini 1.5 Flash":
-        if not GEMINI_API_KEY:
-            raise ValueError("GEMINI_API_KEY not found. Please set it in your .env file.")
+    Args:
+        code (str): The generated code.
+
+    Returns:
+        str: Why the code is invalid, or None if it is valid.
+    """
+    if not code or not code.strip():
+        return "The response was empty."
+    try:
+        tree = ast.parse(clean_code(code))
+    except SyntaxError as e:
+        return f"The generated code is not valid Python: {e}"
+    # Any binding of the name counts, e.g. `fig = ...` or `fig, ax = ...`
+    if any(isinstance(node, ast.Name) and node.id == 'fig' and isinstance(node.ctx, ast.Store) for node in ast.walk(tree)):
+        return None
+    return "The generated code does not assign a chart to `fig`."
+
+
+def _provider(model):
+    """
+    Returns the async call of a model. The pooled provider client is blocking, so it
+    runs on a worker thread; cancelling the call stops its stream at the next chunk.
+    """
+    async def call(prompt, user_request):
+        cancel = threading.Event()
+        loop = asyncio.get_running_loop()
         try:
-            genai.configure(api_key=GEMINI_API_KEY)
-            model = genai.GenerativeModel('gemini-1.5-flash')
-            response = model.generate_content(prompt)
-            return response.text
-        except Exception as e:
-            raise RuntimeError(f"An error occurred while calling the Gemini API: {e}")
+            return await loop.run_in_executor(_BLOCKING_CALLS, generate_code, model, prompt, user_request, cancel)
+        except asyncio.CancelledError:
+            cancel.set()
+            raise
+    return call
+
+
+# The async call of every model, taking (prompt, user_request) and returning the generated code
+PROVIDERS = {model: _provider(model) for model in MODELS}
 
-    elif model == "ChatGPT 4o":
-        if not OPENAI_API_KEY:
-            raise ValueError("OPENAI_API_KEY not found. Please set it in your .env file.")
+
+async def race_visualization_code(
+    user_request,
+    df_for_prompt,
+    models=MODELS,
+    previous_code=None,
+    feedback=None,
+    compare=False,
+    timeout=PROVIDER_TIMEOUT_SECONDS,
+    cache=None,
+    df_profile=None,
+    providers=None
+):
+    """
+    Sends the same request to several models concurrently. By default, the first
+    valid response wins and the other requests are cancelled; with `compare`, all
+    models are awaited so their charts can be shown side by side. Each model gets
+    `timeout` seconds. Cached responses count as finished immediately.
+
+    Args:
+        user_request (str): The user's visualization request.
+        df_for_prompt (pd.DataFrame): The DataFrame the code will run on.
+        models (tuple): The models to ask.
+        previous_code (str): The code to refine, for refinements.
+        feedback (str): The user's feedback, for refinements.
+        compare (bool): Whether to wait for every model instead of the first valid one.
+        timeout (float): The time limit of each model, in seconds.
+        cache (LLMResponseCache): The response cache, if any.
+        df_profile (str): The profile_dataframe() of df_for_prompt, if already computed.
+        providers (dict): The async call of each model (PROVIDERS by default), e.g.
+            stubs for testing without network access.
+
+    Returns:
+        list: The GenerationResult of the winning model only, or, with `compare` or
+            when no response was valid, of every model in `models` order.
+    """
+    providers = providers or PROVIDERS
+    results = {}
+
+    # --- 1. Answer from the cache where possible ---
+    keys = {model: visualization_cache_key(user_request, df_for_prompt, model, previous_code, feedback) for model in models}
+    for model in models:
+        cached = cache.get(keys[model]) if cache is not None else None
+        if cached is not None:
+            results[model] = GenerationResult(model, cached, None, 0.0)
+            if not compare:
+                return [results[model]]
+
+    # --- 2. Ask the remaining models concurrently ---
+    if df_profile is None:
+        df_profile = profile_dataframe(df_for_prompt)
+    prompt = prompt_for(user_request, df_profile, df_for_prompt.columns.tolist(), previous_code, feedback)
+
+    async def run(model):
+        start = time.perf_counter()
         try:
-            client = openai.OpenAI(api_key=OPENAI_API_KEY)
-            response = client.chat.completions.create(
-                model="gpt-4o", # Or another suitable model
-                messages=[
-                    {"role": "system", "content": prompt},
-                    {"role": "user", "content": user_request}
-                ]
-            )
-            return response.choices[0].message.content
+            code = await asyncio.wait_for(providers[model](prompt, user_request), timeout)
+            error = validate_visualization_code(code)
+        except asyncio.TimeoutError:
+            code, error = None, f"{model} did not respond within {timeout:g} seconds."
         except Exception as e:
-            raise RuntimeError(f"An error occurred while calling the OpenAI API: {e}")
-            
-    else:
-        raise ValueError("Invalid model provider specified. Choose 'Gemini' or 'OpenAI'.") 
\ No newline at end of file
+            code, error = None, str(e)
+        if error is None and cache is not None:
+            cache.put(keys[model], code)
+        return GenerationResult(model, code, error, time.perf_counter() - start)
+
+    pending = {asyncio.create_task(run(model)) for model in models if model not in results}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                result = task.result()
+                results[result.model] = result
+                if not compare and result.error is None:
+                    return [result]
+    finally:
+        # The first valid response won: stop waiting for the others
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+    return [results[model] for model in models]
+
+
+def generate_concurrently(user_request, df_for_prompt, **kwargs):
+    """Runs race_visualization_code() from synchronous code such as a Streamlit script."""
+    return asyncio.run(race_visualization_code(user_request, df_for_prompt, **kwargs))
@@ -0,0 +1,174 @@
+import os
+import random
+import threading
+import time
+from dotenv import load_dotenv
+
+# The provider SDKs (google.generativeai, openai) take over a second to import, so
+# they are only imported when a chart is first requested from that provider.
+
+load_dotenv()
+
+# Load API keys from environment variables
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+
+# Optional endpoint overrides, e.g. local stub servers for testing without network access
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")
+
+GEMINI_MODEL = "Gemini 1.5 Flash"
+OPENAI_MODEL = "ChatGPT 4o"
+MODELS = (GEMINI_MODEL, OPENAI_MODEL)
+
+# Every request may take this long (and this long to connect) before it is retried
+LLM_TIMEOUT_SECONDS = 60
+LLM_CONNECT_TIMEOUT_SECONDS = 10
+
+# Transient errors (timeouts, dropped connections, rate limits, server errors) are
+# retried this many times, after a random delay of up to base * 2^attempt seconds
+LLM_MAX_RETRIES = 3
+LLM_BACKOFF_BASE_SECONDS = 0.5
+LLM_BACKOFF_MAX_SECONDS = 8
+
+# The clients are created once per process and shared by all sessions, so their
+# HTTP connection pools are reused across requests.
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _client(model):
+    """Returns the process-wide client of a model, creating it on first use."""
+    with _clients_lock:
+        if model not in _clients:
+            if model == GEMINI_MODEL:
+                import google.generativeai as genai
+                # A custom endpoint, such as a local stub, is served over REST
+                if GEMINI_API_ENDPOINT:
+                    genai.configure(
+                        api_key=GEMINI_API_KEY, transport='rest', client_options={'api_endpoint': GEMINI_API_ENDPOINT}
+                    )
+                else:
+                    genai.configure(api_key=GEMINI_API_KEY)
+                _clients[model] = genai.GenerativeModel('gemini-1.5-flash')
+            else:
+                import httpx
+                import openai
+                # Retries are handled here, with jittered backoff, rather than by the SDK
+                _clients[model] = openai.OpenAI(
+                    api_key=OPENAI_API_KEY,
+                    base_url=OPENAI_BASE_URL,
+                    timeout=httpx.Timeout(LLM_TIMEOUT_SECONDS, connect=LLM_CONNECT_TIMEOUT_SECONDS),
+                    max_retries=0
+                )
+        return _clients[model]
+
+
+def _transient_errors(model):
+    """Returns the exception types of a provider that are worth retrying."""
+    if model == GEMINI_MODEL:
+        from google.api_core import exceptions
+        return (
+            TimeoutError, ConnectionError, exceptions.DeadlineExceeded, exceptions.ServiceUnavailable,
+            exceptions.TooManyRequests, exceptions.ResourceExhausted, exceptions.InternalServerError
+        )
+    import openai
+    return (
+        TimeoutError, ConnectionError, openai.APITimeoutError, openai.APIConnectionError, openai.RateLimitError,
+        openai.InternalServerError
+    )
+
+
+def backoff_delay(attempt):
+    """Returns the delay before a retry: a random ("full jitter") share of the exponential backoff."""
+    return random.uniform(0, min(LLM_BACKOFF_MAX_SECONDS, LLM_BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+
+def _with_retries(call, transient_errors, cancel=None):
+    """
+    Calls `call`, retrying transient errors with jittered exponential backoff. Once
+    `cancel` is set, no further attempt is made and the last error is raised.
+    """
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        try:
+            return call()
+        except transient_errors:
+            if attempt == LLM_MAX_RETRIES or (cancel is not None and cancel.is_set()):
+                raise
+            # Wait for the backoff, but give up right away when cancelled rather than retry
+            if cancel is not None:
+                if cancel.wait(backoff_delay(attempt)):
+                    raise
+            else:
+                time.sleep(backoff_delay(attempt))
+
+
+def _open_stream(model, prompt, user_request):
+    """Starts a streaming request and returns an iterator of text chunks, and a function closing it."""
+    if model == GEMINI_MODEL:
+        response = _client(model).generate_content(
+            prompt, stream=True, request_options={'timeout': LLM_TIMEOUT_SECONDS}
+        )
+        return (chunk.text for chunk in response), lambda: None
+
+    stream = _client(model).chat.completions.create(
+        model="gpt-4o", # Or another suitable model
+        messages=[
+            {"role": "system", "content": prompt},
+            {"role": "user", "content": user_request}
+        ],
+        stream=True
+    )
+    chunks = (event.choices[0].delta.content or "" for event in stream if event.choices)
+    return chunks, stream.close
+
+
+def stream_code(model, prompt, user_request, cancel=None):
+    """
+    Sends a prompt to a model and yields the generated text as it arrives. Starting
+    the request is retried on transient errors; a stream that breaks off after the
+    first chunk is not, since part of it has been shown already.
+
+    Args:
+        model (str): One of MODELS.
+        prompt (str): The prompt.
+        user_request (str): The user's visualization request.
+        cancel (threading.Event): Stops the stream (and any pending retry) once set.
+
+    Yields:
+        str: The chunks of generated text.
+
+    Raises:
+        ValueError: If the model's API key is missing or the model is unknown.
+        RuntimeError: If the API call fails.
+    """
+    if model == GEMINI_MODEL:
+        if not GEMINI_API_KEY:
+            raise ValueError("GEMINI_API_KEY not found. Please set it in your .env file.")
+        provider = "Gemini"
+    elif model == OPENAI_MODEL:
+        if not OPENAI_API_KEY:
+            raise ValueError("OPENAI_API_KEY not found. Please set it in your .env file.")
+        provider = "OpenAI"
+    else:
+        raise ValueError("Invalid model provider specified. Choose 'Gemini' or 'OpenAI'.")
+
+    try:
+        chunks, close = _with_retries(
+            lambda: _open_stream(model, prompt, user_request), _transient_errors(model), cancel
+        )
+        try:
+            for chunk in chunks:
+                if cancel is not None and cancel.is_set():
+                    return
+                if chunk:
+                    yield chunk
+        finally:
+            close()
+    except Exception as e:
+        raise RuntimeError(f"An error occurred while calling the {provider} API: {e}")
+
+
+def generate_code(model, prompt, user_request, cancel=None):
+    """Sends a prompt to a model and returns the complete generated text (see stream_code())."""
+    return "".join(stream_code(model, prompt, user_request, cancel))
@@ -0,0 +1,128 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# The default size of a DataFrame profile in LLM prompts, in tokens. It can be
+# changed with PROFILE_MAX_TOKENS in .env, read when a profile is computed.
+PROFILE_MAX_TOKENS = 1500
+
+# The most frequent values listed per text column, and the sample rows shown,
+# before they are reduced to fit the token budget
+PROFILE_TOP_VALUES = 10
+PROFILE_SAMPLE_ROWS = 12
+
+
+def estimate_tokens(text):
+    """Estimates the number of LLM tokens of a text, at about four characters per token."""
+    return (len(text) + 3) // 4
+
+
+def stratified_sample(df, n_rows):
+    """
+    Picks sample rows spread evenly over the weeks of a view, rather than the
+    head and tail of a week-sorted frame, which only show the newest and oldest week.
+
+    Args:
+        df (pd.DataFrame): The view to sample.
+        n_rows (int): The number of rows to pick.
+
+    Returns:
+        pd.DataFrame: The sample, in the view's order.
+    """
+    if len(df) <= n_rows:
+        return df
+    if 'week_start' not in df.columns:
+        return df.iloc[np.linspace(0, len(df) - 1, n_rows).astype(int)]
+
+    # Round-robin over the weeks: the first row of every week, then the middle ones, and so on
+    weeks = df['week_start'].to_numpy()
+    order = np.argsort(weeks, kind='stable')
+    _, starts, counts = np.unique(weeks[order], return_index=True, return_counts=True)
+    if len(starts) > n_rows:
+        # More weeks than rows: the first row of weeks spread evenly from the oldest to the newest
+        picked_weeks = np.linspace(0, len(starts) - 1, n_rows).round().astype(int)
+        return df.iloc[np.sort(order[starts[picked_weeks]])]
+    per_week = -(-n_rows // len(starts))
+    picks = np.concatenate([starts + (counts * i) // per_week for i in range(per_week)])
+    # Weeks with fewer rows than picks repeat rows, which are only shown once
+    return df.iloc[np.unique(order[picks[:n_rows]])]
+
+
+def _describe_columns(df):
+    """
+    Describes every column once: dtype, missing values, and cardinality and value
+    counts for text columns or the range of dates and numbers.
+
+    Returns:
+        list: A (description, value counts or None) pair per column.
+    """
+    columns = []
+    for col in df.columns:
+        series = df[col]
+        description = f"- {col} ({series.dtype}): {int(series.isna().sum()):,} missing"
+        counts = None
+        if isinstance(series.dtype, pd.CategoricalDtype) or series.dtype == object or pd.api.types.is_bool_dtype(series):
+            counts = series.value_counts(dropna=True)
+            counts = counts[counts > 0]
+            description += f", {len(counts):,} distinct"
+        elif pd.api.types.is_datetime64_any_dtype(series):
+            description += f", {series.nunique():,} distinct, from {series.min()} to {series.max()}"
+        elif pd.api.types.is_numeric_dtype(series) and series.notna().any():
+            description += f", min {series.min()}, median {series.median()}, max {series.max()}"
+        columns.append((description, counts))
+    return columns
+
+
+def _column_lines(columns, top_values):
+    """Renders the column descriptions, listing up to `top_values` most frequent values of text columns."""
+    lines = []
+    for description, counts in columns:
+        if counts is not None and top_values:
+            top = ", ".join(f"{value!s} ({count:,})" for value, count in counts.head(top_values).items())
+            more = f", ... {len(counts) - top_values:,} more" if len(counts) > top_values else ""
+            description += f"; top: {top}{more}"
+        lines.append(description)
+    return lines
+
+
+def profile_dataframe(df, max_tokens=None):
+    """
+    Summarizes a view for LLM prompts: its size, every column's dtype, missing values,
+    cardinality and range or most frequent values (e.g. the model and tool names),
+    and a sample stratified by week. The summary is shrunk to fit the token budget by
+    listing fewer values and sample rows, and cut off as a last resort.
+
+    Args:
+        df (pd.DataFrame): The view the code will run on.
+        max_tokens (int): The token budget of the profile (PROFILE_MAX_TOKENS by default).
+
+    Returns:
+        str: The profile text.
+    """
+    if max_tokens is None:
+        max_tokens = int(os.getenv("PROFILE_MAX_TOKENS", PROFILE_MAX_TOKENS))
+    header = f"{len(df):,} rows x {len(df.columns)} columns"
+    columns = _describe_columns(df)
+    top_values, sample_rows = PROFILE_TOP_VALUES, PROFILE_SAMPLE_ROWS
+    while True:
+        parts = [header, "Columns:", *_column_lines(columns, top_values)]
+        if sample_rows:
+            sample = stratified_sample(df, sample_rows)
+            parts += [f"Sample of {len(sample)} rows across weeks:", sample.to_string(index=False)]
+        profile = "\n".join(parts)
+        if estimate_tokens(profile) <= max_tokens or (not top_values and not sample_rows):
+            break
+        # Sample rows are dropped before the value lists, which describe the whole view
+        if sample_rows > 3:
+            sample_rows //= 2
+        elif top_values > 3:
+            top_values //= 2
+        elif sample_rows:
+            sample_rows = 0
+        else:
+            top_values = 0
+
+    if estimate_tokens(profile) > max_tokens:
+        profile = profile[:max_tokens * 4 - len("\n...")] + "\n..."
+    return profile
@@ -0,0 +1,171 @@
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+
+from core.data import apply_master_schema, week_keys, MASTER_COLS, MASTER_DIR, MASTER_TABLES
+from core.cohorts import cohort_flag, cohort_flags
+from core.retention import pack_weekly_activity
+from core.rollups import ROLLUP_COLS
+
+try:
+    import duckdb
+except ImportError:  # DuckDB is an optional dependency; the pandas path is used without it
+    duckdb = None
+
+
+def duckdb_available():
+    """Returns True if the optional DuckDB query backend can be used."""
+    return duckdb is not None
+
+
+def _source(path, table):
+    """Returns the SQL source reading all weekly partitions of a master table."""
+    pattern = os.path.join(path, MASTER_DIR, table, '*.parquet')
+    if not glob.glob(pattern):
+        return None
+    return "read_parquet('{}')".format(pattern.replace("'", "''"))
+
+
+def _connect(cohorts):
+    """
+    Opens an in-process DuckDB connection with the cohort members registered as a
+    small (email, cohorts) table, built from the cohort definitions rather than the
+    in-memory user dimension, so no fact table is loaded into pandas.
+    """
+    con = duckdb.connect()
+    emails = sorted(set().union(*cohorts.values()))
+    con.register('cohort_members', pd.DataFrame({'email': emails, 'cohorts': cohort_flags(emails, cohorts)}))
+    return con
+
+
+def _filters(cohorts, cohort, start_date=None, end_date=None):
+    """Builds the pushed-down cohort join and date range and cohort predicates, with their parameters."""
+    join, clauses, params = "", [], []
+    if start_date and end_date:
+        clauses.append("f.week_start BETWEEN ? AND ?")
+        params += [pd.Timestamp(start_date), pd.Timestamp(end_date)]
+    flag = cohort_flag(cohorts, cohort)
+    if flag is not None:
+        join = "JOIN cohort_members m ON f.email = m.email"
+        clauses.append("(m.cohorts & ?) <> 0")
+        params.append(flag)
+    return join, ("WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def query_filtered_views(cohorts, cohort, start_date=None, end_date=None, path='.'):
+    """
+    Runs the cohort and date filters of the app directly over the master Parquet
+    files with DuckDB, returning the same (users, models, tools) views as the pandas path.
+    Names are the latest name of every user, like the user dimension's.
+
+    Args:
+        cohorts (dict): The cohort definitions.
+        cohort (str): A cohort name, or ALL_USERS.
+        start_date (date): The first week to include, or None for all weeks.
+        end_date (date): The last week to include, or None for all weeks.
+        path (str): The directory holding the master store.
+
+    Returns:
+        tuple: The filtered (users, models, tools) views, newest week first.
+    """
+    join, where, params = _filters(cohorts, cohort, start_date, end_date)
+    # Every user's name is the one of their latest week, like in the user dimension (undated rows being
+    # the oldest). Usage rows come from the same export rows as the users rows, so those suffice.
+    users_source = _source(path, 'users')
+    names = (
+        f"WITH latest_names AS (SELECT email, arg_max_null(name, coalesce(week_start, TIMESTAMP '1677-09-22')) AS name "
+        f"FROM {users_source} GROUP BY email) "
+    ) if users_source is not None else ""
+    views = []
+    with _connect(cohorts) as con:
+        for table in MASTER_TABLES:
+            columns = MASTER_COLS[table]
+            source = _source(path, table)
+            if source is None:
+                views.append(apply_master_schema(pd.DataFrame(), columns))
+                continue
+            select = ", ".join("n.name" if col == 'name' and names else f"f.{col}" for col in columns)
+            name_join = "LEFT JOIN latest_names n ON f.email = n.email" if names else ""
+            df = con.execute(
+                f"{names}SELECT {select} FROM {source} f {join} {name_join} "
+                f"{where} ORDER BY f.week_start DESC",
+                params
+            ).df()
+            views.append(apply_master_schema(df, columns))
+    return tuple(views)
+
+
+def query_weekly_rollups(cohorts, cohort, start_date=None, end_date=None, path='.'):
+    """
+    Computes the weekly rollups of one cohort and date range with DuckDB, reading
+    only the columns the KPIs need. The result matches select_rollups().
+
+    Args:
+        cohorts (dict): The cohort definitions.
+        cohort (str): A cohort name, or ALL_USERS.
+        start_date (date): The first week to include, or None for all weeks.
+        end_date (date): The last week to include, or None for all weeks.
+        path (str): The directory holding the master store.
+
+    Returns:
+        dict: The 'users', 'models' and 'tools' rollup rows.
+    """
+    join, where, params = _filters(cohorts, cohort, start_date, end_date)
+    # (group keys, aggregates) per rollup table
+    aggregates = {
+        'users': ("f.week_start", "count(*) AS total_users, sum(f.is_active::INTEGER) AS active_users, "
+                                  "sum(f.messages) AS total_messages"),
+        'models': ("f.week_start, f.model", "sum(f.messages) AS messages"),
+        'tools': ("f.week_start, f.tool", "sum(f.messages) AS messages"),
+    }
+    rollups = {}
+    with _connect(cohorts) as con:
+        for table, (keys, aggregate) in aggregates.items():
+            source = _source(path, table)
+            if source is None:
+                rollups[table] = pd.DataFrame(columns=ROLLUP_COLS[table])
+                continue
+            df = con.execute(
+                f"SELECT {keys}, {aggregate} FROM {source} f {join} "
+                f"{where} GROUP BY {keys} ORDER BY f.week_start",
+                params
+            ).df()
+            rollups[table] = df.assign(cohort=cohort).reindex(columns=ROLLUP_COLS[table])
+    return rollups
+
+
+def query_weekly_activity(cohorts, cohort, path='.'):
+    """
+    Builds the weekly active-user bitsets of one cohort with DuckDB, like
+    build_weekly_activity() but without the in-memory fact tables. Users are
+    numbered by their rank among the cohort's active users, which gives the same
+    counts as the user dimension's ids.
+
+    Args:
+        cohorts (dict): The cohort definitions.
+        cohort (str): A cohort name, or ALL_USERS.
+        path (str): The directory holding the master store.
+
+    Returns:
+        WeeklyActivity: The bitsets of every stored week, oldest first.
+    """
+    source = _source(path, 'users')
+    if source is None:
+        return pack_weekly_activity(np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), 0)
+    join, where, params = _filters(cohorts, cohort)
+    active = "f.week_start IS NOT NULL AND (f.is_active OR f.messages > 0)"
+    where = f"{where} AND {active}" if where else f"WHERE {active}"
+    with _connect(cohorts) as con:
+        weeks = con.execute(
+            f"SELECT DISTINCT week_start FROM {source} WHERE week_start IS NOT NULL ORDER BY week_start"
+        ).df()['week_start']
+        rows = con.execute(
+            f"SELECT f.week_start, dense_rank() OVER (ORDER BY f.email) - 1 AS user_id FROM {source} f {join} {where}",
+            params
+        ).df()
+    keys = week_keys(weeks.to_numpy())
+    week_pos = np.searchsorted(keys, week_keys(rows['week_start'].to_numpy()))
+    n_users = int(rows['user_id'].max()) + 1 if len(rows) else 0
+    return pack_weekly_activity(keys, week_pos, rows['user_id'].to_numpy(), n_users)
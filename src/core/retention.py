@@ -0,0 +1,169 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from core.cohorts import cohort_rows
+
+# The active users of every week as packed bitsets over the user_id space: row i of
+# `bits` has bit u set when user u was active in week `keys[i]` (days since 1970-01-01,
+# like WeekIndex keys). With user_id being the user dimension row, a year of weeks
+# for tens of thousands of users is a few hundred KB, and every retention question is
+# a handful of bitwise ANDs/ORs and popcounts over those rows.
+WeeklyActivity = namedtuple('WeeklyActivity', ['keys', 'bits'])
+
+# The number of set bits of every byte value, for popcounts of packed bitsets
+_POPCOUNT = np.array([bin(byte).count('1') for byte in range(256)], dtype=np.int32)
+
+
+def _popcount(bits):
+    """Counts the set bits of packed bitsets along their last axis."""
+    return _POPCOUNT[bits].sum(axis=-1)
+
+
+def build_weekly_activity(users_df, week_index, n_users, flag=None):
+    """
+    Builds the weekly active-user bitsets of one cohort from the week-sorted users
+    fact table. A user counts as active in a week if the export flags them as
+    active or they sent any messages.
+
+    Args:
+        users_df (pd.DataFrame): The week-sorted users fact table.
+        week_index (WeekIndex): Its week index.
+        n_users (int): The size of the user dimension, i.e. the user_id space.
+        flag (int): The cohort's bit flag, or None for all users.
+
+    Returns:
+        WeeklyActivity: The bitsets of every stored week, oldest first.
+    """
+    # Week positions of every dated row, from the week index offsets
+    week_pos = np.repeat(np.arange(len(week_index.keys)), np.diff(week_index.offsets))
+    dated = users_df.iloc[:week_index.offsets[-1]].assign(week_pos=week_pos)
+    dated = cohort_rows(dated, flag)
+    dated = dated[dated['is_active'].to_numpy() | (dated['messages'].to_numpy() > 0)]
+    return pack_weekly_activity(week_index.keys, dated['week_pos'].to_numpy(), dated['user_id'].to_numpy(), n_users)
+
+
+def pack_weekly_activity(keys, week_pos, user_ids, n_users):
+    """
+    Packs (week, user) activity pairs into weekly bitsets.
+
+    Args:
+        keys (np.ndarray): The sorted integer keys of all weeks (see WeekIndex).
+        week_pos (np.ndarray): The position in `keys` of the week of every active pair.
+        user_ids (np.ndarray): The user of every active pair, below n_users.
+        n_users (int): The size of the user id space.
+
+    Returns:
+        WeeklyActivity: The bitsets of every week, oldest first.
+    """
+    active = np.zeros((len(keys), n_users), dtype=bool)
+    active[week_pos, user_ids] = True
+    return WeeklyActivity(keys, np.packbits(active, axis=1))
+
+
+def _week_labels(activity):
+    """Returns the week_start Timestamps of the bitset rows."""
+    return pd.DatetimeIndex(activity.keys.astype('datetime64[D]'), name='week_start')
+
+
+def _shifted_rows(activity, weeks):
+    """
+    Finds the row of the week a given number of weeks after every row's week.
+
+    Returns:
+        np.ndarray: The row positions, -1 where that week was not uploaded.
+    """
+    if not len(activity.keys):
+        return np.empty(0, dtype=np.int64)
+    targets = activity.keys + 7 * weeks
+    rows = np.minimum(np.searchsorted(activity.keys, targets), len(activity.keys) - 1)
+    return np.where(activity.keys[rows] == targets, rows, -1)
+
+
+def weekly_active_users(activity):
+    """
+    Counts the active users of every week.
+
+    Returns:
+        pd.Series: The number of active users, by week_start.
+    """
+    return pd.Series(_popcount(activity.bits), index=_week_labels(activity), name='active_users')
+
+
+def rolling_active_users(activity, window=4):
+    """
+    Counts the distinct users active in any of the `window` calendar weeks ending
+    with every week (e.g. the rolling 4-week active users). Weeks that were not
+    uploaded simply contribute no users.
+
+    Args:
+        activity (WeeklyActivity): The weekly activity bitsets.
+        window (int): The number of weeks in the window.
+
+    Returns:
+        pd.Series: The number of distinct active users, by week_start.
+    """
+    union = activity.bits.copy()
+    for weeks_back in range(1, window):
+        rows = _shifted_rows(activity, -weeks_back)
+        present = rows >= 0
+        union[present] |= activity.bits[rows[present]]
+    return pd.Series(_popcount(union), index=_week_labels(activity), name=f"active_users_{window}w")
+
+
+def retention_matrix(activity, max_weeks=8):
+    """
+    Computes the share of each week's active users that were still active 1 to
+    `max_weeks` calendar weeks later.
+
+    Args:
+        activity (WeeklyActivity): The weekly activity bitsets.
+        max_weeks (int): The largest number of weeks later to compare with.
+
+    Returns:
+        pd.DataFrame: The retention in percent, one row per starting week_start and
+            one column per number of weeks later. NaN where the later week was not
+            uploaded or the starting week had no active users.
+    """
+    active = _popcount(activity.bits).astype(float)
+    base = np.where(active > 0, active, np.nan)
+    columns = {}
+    for weeks in range(1, max_weeks + 1):
+        rows = _shifted_rows(activity, weeks)
+        present = rows >= 0
+        retained = np.full(len(rows), np.nan)
+        retained[present] = _popcount(activity.bits[present] & activity.bits[rows[present]])
+        columns[weeks] = retained / base * 100
+    return pd.DataFrame(columns, index=_week_labels(activity)).rename_axis(columns='weeks_later')
+
+
+def weekly_churn(activity):
+    """
+    Splits every week's active users by their activity in the previous calendar week.
+
+    Returns:
+        pd.DataFrame: Per week_start, the `active`, `retained` (also active the week
+            before), `new_or_returning` (not active the week before) and `churned`
+            (active the week before but not this week) users, and the `churn_rate`
+            in percent of the previous week's active users. NaN without a previous week.
+    """
+    rows = _shifted_rows(activity, -1)
+    present = rows >= 0
+    previous = np.zeros_like(activity.bits)
+    previous[present] = activity.bits[rows[present]]
+
+    active = _popcount(activity.bits)
+    previous_active = _popcount(previous).astype(float)
+    retained = _popcount(activity.bits & previous)
+    churned = _popcount(previous & ~activity.bits).astype(float)
+    churned[~present] = np.nan
+    previous_active[~present] = np.nan
+    return pd.DataFrame({
+        'active': active,
+        'retained': np.where(present, retained, np.nan),
+        'new_or_returning': np.where(present, active - retained, np.nan),
+        'churned': churned,
+        'churn_rate': churned / np.where(previous_active > 0, previous_active, np.nan) * 100,
+    }, index=_week_labels(activity))
+
@@ -0,0 +1,192 @@
+import json
+import os
+
+import pandas as pd
+
+from core.cohorts import ALL_USERS, cohort_flags, cohort_fingerprint, cohort_rows
+from core.data import load_week_partitions, week_modified_time, MASTER_DIR, MASTER_TABLES
+
+# Each rollup table holds one set of rows for all users (ALL_USERS) and one per cohort.
+ROLLUP_COLS = {
+    'users': ['week_start', 'cohort', 'total_users', 'active_users', 'total_messages'],
+    'models': ['week_start', 'cohort', 'model', 'messages'],
+    'tools': ['week_start', 'cohort', 'tool', 'messages'],
+}
+
+# The only fact columns the rollups are computed from
+ROLLUP_SOURCE_COLS = {
+    'users': ['week_start', 'email', 'is_active', 'messages'],
+    'models': ['week_start', 'email', 'model', 'messages'],
+    'tools': ['week_start', 'email', 'tool', 'messages'],
+}
+
+# The rollups are persisted next to the master store, e.g. master/rollups/users.parquet,
+# with a manifest of the partition timestamps and cohort definitions they were computed from.
+ROLLUP_DIR = 'rollups'
+
+
+def compute_weekly_rollups(users_df, models_df, tools_df, cohorts):
+    """
+    Aggregates the fact tables into per-week totals for all users and every
+    cohort, in one grouped pass per table and cohort.
+
+    Args:
+        users_df (pd.DataFrame): The users fact table.
+        models_df (pd.DataFrame): The models fact table.
+        tools_df (pd.DataFrame): The tools fact table.
+        cohorts (dict): The cohort definitions the facts' cohort flags were resolved with.
+
+    Returns:
+        dict: The 'users', 'models' and 'tools' rollup tables (see ROLLUP_COLS).
+    """
+    parts = {table: [] for table in ROLLUP_COLS}
+    flags = {ALL_USERS: None, **{cohort: 1 << bit for bit, cohort in enumerate(cohorts)}}
+    for cohort, flag in flags.items():
+        users = cohort_rows(users_df, flag)
+        parts['users'].append(
+            users.groupby('week_start')
+            .agg(total_users=('user_id', 'size'), active_users=('is_active', 'sum'), total_messages=('messages', 'sum'))
+            .reset_index()
+            .assign(cohort=cohort)
+        )
+        for table, df, key in [('models', models_df, 'model'), ('tools', tools_df, 'tool')]:
+            rows = cohort_rows(df, flag)
+            parts[table].append(
+                rows.groupby(['week_start', key], observed=True)['messages'].sum()
+                .reset_index()
+                .astype({key: str})
+                .assign(cohort=cohort)
+            )
+
+    return {
+        table: pd.concat(table_parts, ignore_index=True).reindex(columns=ROLLUP_COLS[table])
+        for table, table_parts in parts.items()
+    }
+
+
+def merge_weekly_rollups(rollups, new_rollups):
+    """
+    Adds the rollups of newly uploaded weeks, replacing any existing rows for those weeks.
+
+    Args:
+        rollups (dict): The current rollup tables.
+        new_rollups (dict): The rollup tables computed for the new weeks only.
+
+    Returns:
+        dict: The updated rollup tables, sorted by week.
+    """
+    merged = {}
+    for table, df in rollups.items():
+        new_df = new_rollups[table]
+        kept = df[~df['week_start'].isin(new_rollups['users']['week_start'])]
+        merged[table] = pd.concat([kept, new_df], ignore_index=True).sort_values('week_start', kind='stable')
+    return merged
+
+
+def drop_week_rollups(rollups, week):
+    """
+    Removes a deleted week from the rollup tables.
+
+    Args:
+        rollups (dict): The current rollup tables.
+        week (datetime-like): The week_start of the deleted week.
+
+    Returns:
+        dict: The rollup tables without that week.
+    """
+    week = pd.to_datetime(week)
+    return {table: df[df['week_start'] != week] for table, df in rollups.items()}
+
+
+def select_rollups(rollups, cohort, start_date=None, end_date=None):
+    """
+    Selects the rollup rows of one cohort within an optional date range.
+
+    Args:
+        rollups (dict): The rollup tables.
+        cohort (str): A cohort name, or ALL_USERS.
+        start_date (date): The first week to include, or None for no lower bound.
+        end_date (date): The last week to include, or None for no upper bound.
+
+    Returns:
+        dict: The selected 'users', 'models' and 'tools' rollup rows.
+    """
+    selected = {}
+    for table, df in rollups.items():
+        mask = df['cohort'] == cohort
+        if start_date and end_date:
+            mask &= df['week_start'].between(pd.Timestamp(start_date), pd.Timestamp(end_date))
+        selected[table] = df[mask]
+    return selected
+
+
+def _rollups_from_store(weeks, cohorts, path):
+    """Computes the rollups of some weeks from a column-projected read of their partitions."""
+    facts = []
+    for df in load_week_partitions(weeks, path, ROLLUP_SOURCE_COLS):
+        # Resolve the cohort flags once per email category, and use the codes as user_id
+        email = df['email']
+        flags = cohort_flags(email.cat.categories, cohorts)
+        codes = email.cat.codes.to_numpy()
+        facts.append(df.assign(user_id=codes, cohorts=flags[codes]))
+    return compute_weekly_rollups(*facts, cohorts)
+
+
+def load_weekly_rollups(weeks, cohorts, path='.'):
+    """
+    Loads the persisted weekly rollups of the master store, so the KPIs can be
+    shown without reading the fact tables. Weeks whose partitions were written
+    after their rollups (or all weeks, if the cohorts changed) are recomputed
+    from the few columns the rollups need, and the persisted rollups are updated.
+
+    Args:
+        weeks (list): The week_start values in the master store.
+        cohorts (dict): The cohort definitions.
+        path (str): The directory holding the master store.
+
+    Returns:
+        dict: The 'users', 'models' and 'tools' rollup tables (see ROLLUP_COLS).
+    """
+    rollup_dir = os.path.join(path, MASTER_DIR, ROLLUP_DIR)
+    manifest_file = os.path.join(rollup_dir, 'manifest.json')
+    try:
+        with open(manifest_file) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        manifest = {}
+
+    # --- 1. Find the weeks whose partitions changed since their rollups were computed ---
+    fingerprint = cohort_fingerprint(cohorts)
+    computed = manifest.get('weeks', {}) if manifest.get('cohorts') == fingerprint else {}
+    modified = {pd.Timestamp(week).strftime('%Y-%m-%d'): week_modified_time(week, path) for week in weeks}
+    stale = [pd.Timestamp(week) for week, mtime in modified.items() if computed.get(week) != mtime]
+
+    rollups = {}
+    if computed:
+        rollups = {
+            table: pd.read_parquet(os.path.join(rollup_dir, f"{table}.parquet"), memory_map=True)
+            for table in MASTER_TABLES
+        }
+    if computed and not stale and computed.keys() == modified.keys():
+        return rollups
+
+    # --- 2. Recompute those weeks, drop deleted ones, and persist the result ---
+    new_rollups = _rollups_from_store(stale, cohorts, path)
+    current = pd.to_datetime(list(modified))
+    merged = {}
+    for table, new_df in new_rollups.items():
+        parts = [new_df]
+        if table in rollups:
+            df = rollups[table]
+            parts.insert(0, df[df['week_start'].isin(current) & ~df['week_start'].isin(stale)])
+        merged[table] = pd.concat(parts, ignore_index=True).sort_values('week_start', kind='stable').reset_index(drop=True)
+
+    os.makedirs(rollup_dir, exist_ok=True)
+    for table, df in merged.items():
+        rollup_file = os.path.join(rollup_dir, f"{table}.parquet")
+        df.to_parquet(rollup_file + '.tmp', index=False)
+        os.replace(rollup_file + '.tmp', rollup_file)
+    with open(manifest_file + '.tmp', 'w') as f:
+        json.dump({'cohorts': fingerprint, 'weeks': modified}, f, indent=2)
+    os.replace(manifest_file + '.tmp', manifest_file)
+    return merged
@@ -0,0 +1,412 @@
+import ast
+import atexit
+import builtins
+import hashlib
+import multiprocessing
+import multiprocessing.connection
+import os
+import queue
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import types
+import uuid
+from collections import OrderedDict
+
+import pyarrow as pa
+
+# Generated plot code runs in a pool of worker processes started ahead of time, with
+# pandas and Plotly already imported. Each job may take SANDBOX_TIMEOUT_SECONDS of
+# wall-clock time and allocate SANDBOX_MEMORY_LIMIT_BYTES beyond the worker's baseline;
+# a worker that exceeds either is replaced, so the server process is never affected.
+SANDBOX_WORKERS = min(4, os.cpu_count() or 1)
+SANDBOX_TIMEOUT_SECONDS = 30
+SANDBOX_MEMORY_LIMIT_BYTES = 1024 * 1024 * 1024
+
+# Views reach the workers as Arrow IPC files they memory-map, in shared memory where
+# available. The most recently used ones are kept for further jobs on the same view.
+SANDBOX_DATA_DIR = os.path.join('/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(),
+                                f"usage-analytics-sandbox-{os.getpid()}")
+SANDBOX_SHARED_VIEWS = 8
+
+# Generated code can only import these modules, by their full names. Everything else,
+# e.g. os, subprocess, socket, or submodules with file readers like pandas.io.parsers,
+# numpy.lib.npyio or plotly.io, raises an ImportError.
+SANDBOX_ALLOWED_IMPORTS = frozenset({
+    'pandas', 'numpy', 'plotly.express', 'plotly.graph_objects', 'plotly.subplots', 'plotly.colors',
+    'math', 'statistics', 'datetime', 'calendar', 'collections', 'itertools', 'functools', 're',
+    'string', 'textwrap',
+})
+
+# The environment variables the workers start with; all others, e.g. the API keys, are
+# left out, as a process can always read the environment it was started with
+SANDBOX_ENVIRONMENT = ('PATH', 'LANG', 'LC_ALL', 'LC_CTYPE', 'TZ', 'TMPDIR')
+
+# Builtins generated code cannot use: file access, dynamic code, imports (replaced by
+# the guarded import above) and access to attributes by computed names
+_BLOCKED_BUILTINS = frozenset({
+    'open', 'exec', 'eval', 'compile', '__import__', 'input', 'breakpoint', 'help',
+    'exit', 'quit', 'globals', 'locals', 'vars', 'getattr', 'setattr', 'delattr',
+})
+
+# Attributes generated code cannot access, besides all dunder attributes and all
+# `read_*` functions: modules reachable through allowed ones (e.g. pandas.io.common.os
+# or numpy.lib.npyio), and numpy's file readers and writers wherever they are reached
+_BLOCKED_ATTRIBUTES = frozenset({
+    'os', 'sys', 'subprocess', 'socket', 'shutil', 'pathlib', 'io', 'builtins',
+    'importlib', 'ctypes', 'signal', 'multiprocessing', 'core', 'lib', 'rec', 'offline',
+    'tofile', 'dump', 'fromfile', 'fromregex', 'loadtxt', 'genfromtxt', 'memmap', 'DataSource',
+})
+
+# File readers and writers of the allowed libraries, disabled in the workers. The
+# text writers stay available for building strings, i.e. without a path or buffer.
+_BLOCKED_FUNCTIONS = {
+    'numpy': ['load', 'save', 'savez', 'savez_compressed', 'savetxt', 'loadtxt', 'genfromtxt', 'fromfile',
+              'fromregex', 'memmap', 'DataSource'],
+    'plotly.io': ['write_html', 'write_image', 'write_json', 'read_json'],
+    'plotly.offline': ['plot'],
+}
+_BLOCKED_METHODS = [
+    'to_pickle', 'to_excel', 'to_feather', 'to_hdf', 'to_sql', 'to_stata', 'to_orc', 'to_parquet', 'to_clipboard',
+]
+_TEXT_WRITERS = ['to_csv', 'to_json', 'to_html', 'to_xml', 'to_latex', 'to_markdown', 'to_string']
+_FIGURE_WRITERS = ['write_html', 'write_image', 'write_json']
+
+
+def _virtual_memory_bytes():
+    """Returns the virtual memory size of the current process (Linux only), or None."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[0]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return None
+
+
+def _limit_memory(limit_bytes):
+    """Caps the address space of the current process at its current size plus limit_bytes, where supported."""
+    try:
+        import resource
+    except ImportError:  # Not available on Windows; only the time limit applies there
+        return
+    baseline = _virtual_memory_bytes()
+    if baseline is not None:
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        resource.setrlimit(resource.RLIMIT_AS, (baseline + limit_bytes, hard))
+
+
+def _limit_file_writes():
+    """Makes writing any data to files fail in the current process, where supported."""
+    try:
+        import resource
+        import signal
+    except ImportError:
+        return
+    # Writes beyond the limit raise an OSError instead of killing the process
+    signal.signal(signal.SIGXFSZ, signal.SIG_IGN)
+    resource.setrlimit(resource.RLIMIT_FSIZE, (0, 0))
+
+
+def _blocked(name):
+    """Returns a function that refuses to run in place of the file reader or writer `name`."""
+    def blocked(*args, **kwargs):
+        raise PermissionError(f"{name} is not available to generated code.")
+    return blocked
+
+
+def _text_writer(method, name):
+    """Wraps a text writer of pandas so that it only returns strings, never writes to a path or buffer."""
+    def writer(self, *args, **kwargs):
+        targets = [kwargs.get(name) for name in ('path_or_buf', 'path_or_buffer', 'buf')]
+        if (args and args[0] is not None) or any(target is not None for target in targets):
+            raise PermissionError(f"{name} can only return a string in generated code.")
+        return method(self, *args, **kwargs)
+    return writer
+
+
+def _disable_file_access(pd):
+    """Replaces the file readers and writers of pandas, numpy and Plotly in the current process."""
+    import importlib
+    from plotly.basedatatypes import BaseFigure
+
+    for name in dir(pd):
+        if name.startswith('read_'):
+            setattr(pd, name, _blocked(f"pandas.{name}"))
+    for name in ('ExcelFile', 'ExcelWriter', 'HDFStore', 'to_pickle'):
+        setattr(pd, name, _blocked(f"pandas.{name}"))
+    for module_name, names in _BLOCKED_FUNCTIONS.items():
+        module = importlib.import_module(module_name)
+        for name in names:
+            setattr(module, name, _blocked(f"{module_name}.{name}"))
+    for cls in (pd.DataFrame, pd.Series):
+        for name in _BLOCKED_METHODS:
+            if hasattr(cls, name):
+                setattr(cls, name, _blocked(f"{cls.__name__}.{name}"))
+        for name in _TEXT_WRITERS:
+            if hasattr(cls, name):
+                setattr(cls, name, _text_writer(getattr(cls, name), f"{cls.__name__}.{name}"))
+    for name in _FIGURE_WRITERS:
+        setattr(BaseFigure, name, _blocked(f"Figure.{name}"))
+    # Showing a figure would start a browser or a local server; the app renders `fig` itself
+    BaseFigure.show = lambda self, *args, **kwargs: None
+    importlib.import_module('plotly.io').show = lambda *args, **kwargs: None
+
+
+def _guarded_import(name, globals=None, locals=None, fromlist=(), level=0):
+    """
+    Imports a module for generated code, if it is allowed. A package of allowed
+    modules, e.g. plotly, can only be imported from, and only its allowed modules
+    (`from plotly import express`).
+    """
+    fromlist = fromlist or ()
+    package = any(allowed.startswith(f"{name}.") for allowed in SANDBOX_ALLOWED_IMPORTS)
+    if level != 0 or not (name in SANDBOX_ALLOWED_IMPORTS or (package and fromlist)):
+        raise ImportError(f"Importing {name} is not allowed in generated code.")
+    module = builtins.__import__(name, globals, locals, fromlist, level)
+    for attr in fromlist:
+        if attr.startswith('read_'):
+            raise ImportError(f"Importing {name}.{attr} is not allowed in generated code.")
+        value = getattr(module, attr, None)
+        if (name not in SANDBOX_ALLOWED_IMPORTS or isinstance(value, types.ModuleType)) and \
+                getattr(value, '__name__', None) not in SANDBOX_ALLOWED_IMPORTS:
+            raise ImportError(f"Importing {name}.{attr} is not allowed in generated code.")
+    return module
+
+
+def restricted_builtins():
+    """Returns the builtins available to generated code: all but the blocked ones, with a guarded import."""
+    allowed = {name: value for name, value in vars(builtins).items() if name not in _BLOCKED_BUILTINS}
+    allowed['__import__'] = _guarded_import
+    return allowed
+
+
+def check_code(code):
+    """
+    Rejects generated code that accesses dunder names or attributes (e.g.
+    `().__class__.__subclasses__()`), file readers (`read_*`) or other blocked
+    attributes (e.g. `pd.io.common.os`).
+
+    Raises:
+        SyntaxError: If the code is not valid Python.
+        PermissionError: If the code accesses a blocked name or attribute.
+    """
+    for node in ast.walk(ast.parse(code)):
+        if isinstance(node, ast.Attribute) and (node.attr.startswith(('__', 'read_')) or node.attr in _BLOCKED_ATTRIBUTES):
+            raise PermissionError(f"Accessing .{node.attr} is not allowed in generated code.")
+        if isinstance(node, ast.Name) and node.id.startswith('__'):
+            raise PermissionError(f"Accessing {node.id} is not allowed in generated code.")
+
+
+def _worker_main(conn, memory_limit_bytes, work_dir):
+    """
+    Runs jobs in a worker process: reads the view from its Arrow IPC file, runs the
+    code, and sends back the figure as JSON. Exits after running out of memory, as
+    the interpreter may be left in an inconsistent state.
+
+    The code runs with restricted builtins and imports, without the file readers
+    and writers of pandas, numpy and Plotly, in an empty read-only working
+    directory, and unable to write data to any file.
+    """
+    import pandas as pd
+    import plotly.express as px
+    _disable_file_access(pd)
+    os.chdir(work_dir)
+    _limit_memory(memory_limit_bytes)
+    _limit_file_writes()
+    safe_builtins = restricted_builtins()
+
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+        code, data_file = job
+        try:
+            with pa.memory_map(data_file) as source:
+                df = pa.ipc.open_file(source).read_all().to_pandas()
+            check_code(code)
+            local_scope = {"df": df, "px": px, "pd": pd}
+            exec(code, {"__builtins__": safe_builtins}, local_scope)
+            fig = local_scope.get("fig")
+            conn.send(('ok', fig.to_json() if fig is not None else None))
+        except MemoryError:
+            conn.send(('memory', None))
+            return
+        except Exception as e:
+            conn.send(('error', f"{type(e).__name__}: {e}"))
+
+
+def _run_worker(fd, memory_limit_bytes, work_dir):
+    """Runs a worker started by SandboxPool in a new interpreter, on the pipe it passed as file descriptor fd."""
+    _worker_main(multiprocessing.connection.Connection(fd), memory_limit_bytes, work_dir)
+
+
+class _WorkerProcess(subprocess.Popen):
+    """A worker's interpreter, with the Process methods SandboxPool uses."""
+
+    def is_alive(self):
+        return self.poll() is None
+
+    def join(self):
+        self.wait()
+
+
+class SandboxPool:
+    """
+    Runs generated plot code in isolated, pre-warmed worker processes with time and
+    memory limits, and without access to files, the network or other processes
+    (see _worker_main). Views are passed as memory-mapped Arrow IPC files rather than
+    pickled, and only the figure JSON comes back. Jobs from concurrent sessions run
+    in parallel, up to one per worker; further jobs wait for a free worker.
+    """
+
+    def __init__(self, workers=SANDBOX_WORKERS, timeout=SANDBOX_TIMEOUT_SECONDS,
+                 memory_limit_bytes=SANDBOX_MEMORY_LIMIT_BYTES):
+        self.timeout = timeout
+        self.memory_limit_bytes = memory_limit_bytes
+        # Spawned rather than forked, as the server process runs many threads
+        self._context = multiprocessing.get_context('spawn')
+        self._idle = queue.Queue()
+        # The workers' working directory: empty, and not writable by them
+        self._work_dir = tempfile.mkdtemp(prefix='usage-analytics-sandbox-cwd-')
+        os.chmod(self._work_dir, 0o500)
+        for _ in range(workers):
+            self._idle.put(self._start_worker())
+        self._shared = OrderedDict()
+        self._shared_lock = threading.Lock()
+        os.makedirs(SANDBOX_DATA_DIR, exist_ok=True)
+        atexit.register(self.close)
+
+    def _start_worker(self):
+        parent_conn, child_conn = self._context.Pipe()
+        if os.name == 'nt':
+            # Windows can't pass the pipe to a new interpreter, so workers inherit the environment there
+            process = self._context.Process(
+                target=_worker_main, args=(child_conn, self.memory_limit_bytes, self._work_dir), daemon=True
+            )
+            process.start()
+        else:
+            # A new interpreter rather than a spawned Process, as only it can start with a clean environment
+            src_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+            command = (f"import sys; sys.path.insert(0, {src_dir!r}); from core.sandbox import _run_worker; "
+                       f"_run_worker({child_conn.fileno()}, {self.memory_limit_bytes}, {self._work_dir!r})")
+            environment = {name: os.environ[name] for name in SANDBOX_ENVIRONMENT if name in os.environ}
+            process = _WorkerProcess([sys.executable, '-c', command], env=environment, cwd=self._work_dir,
+                                     pass_fds=[child_conn.fileno()])
+        child_conn.close()
+        return process, parent_conn
+
+    def _stop_worker(self, worker):
+        process, conn = worker
+        process.kill()
+        process.join()
+        conn.close()
+
+    def _share(self, df, view_key):
+        """Writes a view to an Arrow IPC file for the workers, reusing the file of a view seen before."""
+        key = hashlib.sha256(repr(view_key if view_key is not None else uuid.uuid4().hex).encode()).hexdigest()[:32]
+        data_file = os.path.join(SANDBOX_DATA_DIR, f"{key}.arrow")
+        with self._shared_lock:
+            if key in self._shared:
+                self._shared.move_to_end(key)
+                return data_file
+
+        temp_file = f"{data_file}.{uuid.uuid4().hex}.tmp"
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        with pa.OSFile(temp_file, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(temp_file, data_file)
+
+        with self._shared_lock:
+            self._shared[key] = data_file
+            self._shared.move_to_end(key)
+            # Workers that still map an evicted file keep it readable until they are done
+            while len(self._shared) > SANDBOX_SHARED_VIEWS:
+                _, evicted_file = self._shared.popitem(last=False)
+                try:
+                    os.remove(evicted_file)
+                except FileNotFoundError:
+                    pass
+        return data_file
+
+    def run(self, code, df, view_key=None):
+        """
+        Runs generated code against a view in a worker process.
+
+        Args:
+            code (str): The code, which must assign its chart to `fig`.
+            df (pd.DataFrame): The view the code runs on, as `df`.
+            view_key (tuple): Identifies the view and its data version, so its shared
+                file is reused across jobs, or None to share it for this job only.
+
+        Returns:
+            str: The figure as Plotly JSON, or None if the code did not assign `fig`.
+
+        Raises:
+            TimeoutError: If the code ran longer than the time limit, or no worker became free in time.
+            MemoryError: If the code exceeded the memory limit.
+            RuntimeError: If the code raised an error.
+        """
+        data_file = self._share(df, view_key)
+        try:
+            worker = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError("All chart workers are busy. Please try again shortly.")
+
+        try:
+            process, conn = worker
+            if not process.is_alive():
+                worker = self._start_worker()
+                process, conn = worker
+            conn.send((code, data_file))
+            if not conn.poll(self.timeout):
+                self._stop_worker(worker)
+                worker = self._start_worker()
+                raise TimeoutError(f"The generated code did not finish within {self.timeout:g} seconds.")
+            try:
+                status, payload = conn.recv()
+            except (EOFError, OSError):
+                status, payload = 'memory', None  # The worker died, e.g. killed by the OS for its memory use
+            if status == 'memory':
+                self._stop_worker(worker)
+                worker = self._start_worker()
+                raise MemoryError(
+                    f"The generated code exceeded the memory limit of {self.memory_limit_bytes // 1024 ** 2:,} MB."
+                )
+            if status == 'error':
+                raise RuntimeError(payload)
+            return payload
+        finally:
+            self._idle.put(worker)
+            if view_key is None:
+                self._forget(data_file)
+
+    def _forget(self, data_file):
+        with self._shared_lock:
+            for key, shared_file in list(self._shared.items()):
+                if shared_file == data_file:
+                    del self._shared[key]
+        try:
+            os.remove(data_file)
+        except FileNotFoundError:
+            pass
+
+    def close(self):
+        """Stops the workers and removes the shared views and the workers' working directory."""
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._stop_worker(worker)
+        with self._shared_lock:
+            for data_file in self._shared.values():
+                try:
+                    os.remove(data_file)
+                except FileNotFoundError:
+                    pass
+            self._shared.clear()
+        shutil.rmtree(self._work_dir, ignore_errors=True)
@@ -0,0 +1,158 @@
+import threading
+from collections import namedtuple
+
+import pandas as pd
+
+from core.cohorts import load_cohorts
+from core.data import (
+    open_master_store, load_master_data, load_week_partitions, normalize_master_frames, refresh_user_names,
+    concat_master_frames, partition_mtimes, sort_by_week, drop_weeks, FACT_COLS
+)
+from core.rollups import load_weekly_rollups, compute_weekly_rollups, merge_weekly_rollups, drop_week_rollups
+
+# The master data at one version. cohorts holds the cohort definitions the flags of
+# the user dimension and fact tables were resolved with. The fact tables are sorted
+# by week, and week_index holds the WeekIndex of each of them by table name. The user
+# dimension, the fact tables and their week indexes are None until a component first
+# needs them (see MasterStore.snapshot()).
+MasterSnapshot = namedtuple(
+    'MasterSnapshot', ['version', 'cohorts', 'rollups', 'user_dim', 'users_df', 'models_df', 'tools_df', 'week_index']
+)
+
+
+class MasterStore:
+    """
+    Read-only master data shared by every session of the process. Each upload or
+    deletion builds new frames and publishes them as the next version by swapping
+    a single reference, so a session keeps a consistent snapshot for the whole
+    run and picks the new version up on its next rerun. Weeks written or deleted
+    by other processes (e.g. the ingest CLI or another server) are noticed from
+    the partition files' modification times and published the same way.
+    Snapshots are shared: their frames must never be modified in place.
+    """
+
+    def __init__(self, path='.'):
+        self.path = path
+        # Held by writers for the whole update (files and memory), so concurrent uploads are applied one at a time
+        self.lock = threading.RLock()
+        # The cohort definitions are read once; changing them takes a restart
+        cohorts = load_cohorts(path)
+        rollups = load_weekly_rollups(open_master_store(path), cohorts, path)
+        # The partition files the current version was published from, with their modification times
+        self._partitions = partition_mtimes(path)
+        self._snapshot = MasterSnapshot(1, cohorts, rollups, None, None, None, None, None)
+
+    @property
+    def version(self):
+        """The current data version, increased by every published change."""
+        return self._snapshot.version
+
+    def snapshot(self, facts=False):
+        """
+        Returns the current snapshot of the master data, after publishing any
+        changes other processes made to the master store.
+
+        Args:
+            facts (bool): Whether the user dimension and fact tables are needed.
+                They are loaded on first request, without changing the version.
+
+        Returns:
+            MasterSnapshot: The current snapshot.
+        """
+        self._refresh()
+        return self._current(facts)
+
+    def _refresh(self):
+        """Publishes the weeks whose partition files were written or deleted by another process."""
+        if partition_mtimes(self.path) == self._partitions:
+            return
+        with self.lock:
+            partitions = partition_mtimes(self.path)
+            # Weeks with a partition file added, removed or rewritten in any table
+            changed = {week for (_, week), _ in set(partitions.items()) ^ set(self._partitions.items())}
+            if not changed:
+                return
+            if self._snapshot.users_df is None:
+                # Without facts in memory, the rollups of the changed weeks are simply recomputed
+                self._publish(rollups=load_weekly_rollups(open_master_store(self.path), self._snapshot.cohorts, self.path))
+            else:
+                weeks = [pd.NaT if week == 'undated' else pd.Timestamp(week) for week in sorted(changed)]
+                self.replace_weeks(weeks, *load_week_partitions(weeks, self.path))
+
+    def _current(self, facts=False):
+        """Returns the current snapshot, loading its facts if needed, without checking for outside changes."""
+        snapshot = self._snapshot
+        if facts and snapshot.users_df is None:
+            with self.lock:
+                snapshot = self._snapshot
+                if snapshot.users_df is None:
+                    user_dim, *facts = load_master_data(self.path, snapshot.cohorts)
+                    snapshot = snapshot._replace(user_dim=user_dim, **self._indexed(zip(FACT_COLS, facts)))
+                    self._snapshot = snapshot
+        return snapshot
+
+    def _indexed(self, facts):
+        """Sorts (table, fact table) pairs by week and returns them as snapshot fields, with their week indexes."""
+        fields, week_index = {}, {}
+        for table, df in facts:
+            fields[f"{table}_df"], week_index[table] = sort_by_week(df)
+        return dict(fields, week_index=week_index)
+
+    def _without_weeks(self, snapshot, weeks):
+        """
+        Returns the facts, week indexes and rollups of a snapshot without the given weeks, as range drops,
+        and its user dimension with the names that came from those weeks recomputed.
+        """
+        fields, week_index = {}, {}
+        for table in FACT_COLS:
+            fields[f"{table}_df"], week_index[table] = drop_weeks(
+                getattr(snapshot, f"{table}_df"), snapshot.week_index[table], weeks
+            )
+        rollups = snapshot.rollups
+        for week in weeks:
+            rollups = drop_week_rollups(rollups, week)
+        user_dim = refresh_user_names(snapshot.user_dim, *(fields[f"{table}_df"] for table in FACT_COLS), weeks, self.path)
+        return dict(fields, week_index=week_index, rollups=rollups, user_dim=user_dim)
+
+    def replace_weeks(self, weeks, new_users, new_models, new_tools):
+        """
+        Publishes newly processed weeks, replacing any existing data for those weeks.
+        Email and name are moved into the user dimension, and the rows are keyed by user_id.
+        The partitions of those weeks must already be written, as the names that came
+        from the replaced data are read back from the other weeks' partitions.
+
+        Args:
+            weeks (list): The week_start values being written.
+            new_users (pd.DataFrame): The processed users rows of those weeks.
+            new_models (pd.DataFrame): The processed models rows of those weeks.
+            new_tools (pd.DataFrame): The processed tools rows of those weeks.
+        """
+        with self.lock:
+            snapshot = self._current(facts=True)
+            kept = self._without_weeks(snapshot, weeks)
+            user_dim, *new_facts = normalize_master_frames(
+                new_users, new_models, new_tools, kept['user_dim'], snapshot.cohorts
+            )
+            facts = self._indexed(
+                (table, concat_master_frames([kept[f"{table}_df"], new_df], FACT_COLS[table]))
+                for table, new_df in zip(FACT_COLS, new_facts)
+            )
+
+            # Only the new weeks are aggregated; the rollups of other weeks are kept as they are
+            rollups = merge_weekly_rollups(kept['rollups'], compute_weekly_rollups(*new_facts, snapshot.cohorts))
+            self._publish(user_dim=user_dim, rollups=rollups, **facts)
+
+    def delete_weeks(self, weeks):
+        """
+        Publishes the master data without the given weeks, whose partitions must already be deleted.
+
+        Args:
+            weeks (list): The week_start values that were deleted.
+        """
+        with self.lock:
+            self._publish(**self._without_weeks(self._current(facts=True), weeks))
+
+    def _publish(self, **changes):
+        # The writer has already updated the files, so their current state is the one being published
+        self._partitions = partition_mtimes(self.path)
+        self._snapshot = self._snapshot._replace(version=self._snapshot.version + 1, **changes)
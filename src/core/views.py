@@ -0,0 +1,111 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from core.data import attach_user_columns, week_rows, MASTER_TABLES, USER_COLS, MODEL_COLS, TOOL_COLS
+from core.cohorts import cohort_flag, cohort_rows
+
+# The total size of the cached views, above which the least recently used ones are evicted
+VIEW_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+
+def _size_of(value):
+    """Estimates the memory held by a cached value made of DataFrames and arrays."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sum(_size_of(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(_size_of(item) for item in value)
+    return 0
+
+
+class ViewCache:
+    """
+    Memoizes derived views of the master data, e.g. the filtered frames of one
+    cohort and date range. Keys must include the data version the views were
+    built from, so a new version never sees stale entries. Entries are evicted
+    least recently used first once their total size exceeds `max_bytes`, or their
+    number exceeds `max_entries` (for values whose size cannot be estimated).
+    Cached views are shared between sessions and must not be modified in place.
+    """
+
+    def __init__(self, max_bytes=VIEW_CACHE_MAX_BYTES, max_entries=None):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, build):
+        """
+        Returns the cached value for a key, building and caching it on a miss.
+
+        Args:
+            key (tuple): The cache key, including the data version.
+            build (callable): Builds the value when it is not cached.
+
+        Returns:
+            The cached or newly built value.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+
+        # Built outside the lock, so a slow view does not block other sessions
+        value = build()
+        size = _size_of(value)
+        with self._lock:
+            if key not in self._entries and size <= self.max_bytes:
+                self._entries[key] = (value, size)
+                self._size += size
+                while self._size > self.max_bytes or (self.max_entries and len(self._entries) > self.max_entries):
+                    _, (_, evicted_size) = self._entries.popitem(last=False)
+                    self._size -= evicted_size
+        return value
+
+
+def build_filtered_views(snapshot, cohort, start_date=None, end_date=None):
+    """
+    Builds the user-facing (users, models, tools) views of one cohort and date
+    range from a snapshot of the master data. The fact tables are sorted by week,
+    so the date range is a slice found with the week index. Email and name are
+    looked up from the user dimension, and the rows are ordered newest week first.
+
+    Args:
+        snapshot (MasterSnapshot): A snapshot with the fact tables loaded.
+        cohort (str): A cohort name, or ALL_USERS.
+        start_date (date): The first week to include, or None for all weeks.
+        end_date (date): The last week to include, or None for all weeks.
+
+    Returns:
+        tuple: The filtered (users, models, tools) views.
+    """
+    user_dim = snapshot.user_dim
+    flag = cohort_flag(snapshot.cohorts, cohort)
+    views = []
+    for table, columns in zip(MASTER_TABLES, (USER_COLS, MODEL_COLS, TOOL_COLS)):
+        df = getattr(snapshot, f"{table}_df")
+        index = snapshot.week_index[table]
+
+        # Select the date range, newest week first. Undated rows are only shown without a range.
+        start_row, stop_row = week_rows(index, start_date, end_date) if start_date and end_date else week_rows(index)
+        df_view = df.iloc[start_row:stop_row].iloc[::-1]
+        if not (start_date and end_date):
+            df_view = pd.concat([df_view, df.iloc[index.offsets[-1]:]])
+
+        # Cohort membership is resolved into bit flags on every row, so this is a mask application
+        df_view = cohort_rows(df_view, flag)
+
+        # Look up email and name from the user dimension for display
+        views.append(attach_user_columns(df_view, user_dim, columns).reset_index(drop=True))
+    return tuple(views)
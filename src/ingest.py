@@ -0,0 +1,43 @@
+"""
+Command-line bulk ingestion of weekly ChatGPT Enterprise exports.
+
+Processes many CSV files in parallel and adds their weeks to the master store
+in a single write, replacing the data of weeks that were uploaded before.
+Files whose exact bytes were already ingested are skipped. Run it from the
+project root, like the app:
+
+    python src/ingest.py "exports/User Report 2025-03-23.csv" "exports/User Report 2025-03-30.csv"
+"""
+import argparse
+
+from core.ingest import ingest_files
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('files', nargs='+', help='The CSV exports to ingest.')
+    parser.add_argument('--path', default='.', help='The directory holding the master store.')
+    parser.add_argument('--workers', type=int, default=None, help='Number of worker processes (default: CPU count).')
+    args = parser.parse_args()
+
+    weeks, report = ingest_files(
+        [(filename, filename) for filename in args.files],
+        args.path,
+        max_workers=args.workers
+    )
+
+    print(f"Processed {len(report['processed'])} file(s) and restored {len(report['restored'])} from the "
+          f"ingest cache, {len(weeks)} week(s) written.")
+    for filename in report['unchanged']:
+        print(f"Skipped {filename}: this file has already been uploaded.")
+    for filename in report['duplicates']:
+        print(f"Skipped {filename}: another file of this batch has the same report date.")
+    for filename, error in report['failed']:
+        print(f"Failed {filename}: {error}")
+    if report['skipped_cells']:
+        print(f"Skipped {report['skipped_cells']} malformed model/tool usage cell(s).")
+    return 1 if report['failed'] else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
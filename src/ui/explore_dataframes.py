@@ -1,15 +1,61 @@
 import streamlit as st
+from core.export import export_view, EXPORT_FORMATS
+from ui.table_viewer import show_table
+
+def show_export(df, name, view_key):
+    """
+    Renders the export action of a view. Nothing is exported until the user clicks
+    Download: the filtered view is then written to disk as Parquet or Arrow IPC one
+    record batch at a time, and the finished file is read into memory to be served.
+    Earlier exports of the same view are reused. Reruns never write, read or
+    register the file.
+
+    Writing the export takes memory for one batch only, but serving it does not:
+    Streamlit holds the whole file in memory for each download (a file object
+    passed as `data` is read in full too), so that part grows with the export size.
+    """
+    format_col, button_col = st.columns([0.5, 0.5], vertical_alignment="bottom")
+    with format_col:
+        export_format = st.selectbox("Export format", list(EXPORT_FORMATS), key=f"{name}_export_format")
+    extension, mime = EXPORT_FORMATS[export_format]
+
+    def export_data():
+        with open(export_view(df, export_format, (name,) + tuple(view_key)), 'rb') as export_file:
+            return export_file.read()
+
+    with button_col:
+        st.download_button(
+            f"Download {name}{extension}",
+            data=export_data,
+            file_name=f"{name}{extension}",
+            mime=mime,
+            key=f"{name}_export_download",
+            use_container_width=True
+        )
+
+def show_explore_dataframes(users_df_view, models_df_view, tools_df_view, view_key=None):
+    """
+    Renders the dataframe exploration section for Users, Models, and Tools.
+    Only the selected table is rendered, one page at a time, so the other views
+    are never sent to the browser. view_key is the cache key of the views.
+    """
 
-def show_explore_dataframes(users_df_view, models_df_view, tools_df_view):
-    """Renders the dataframe exploration section with tabs for Users, Models, and Tools."""
-    
     st.header("Explore the Dataframes")
-    tab1, tab2, tab3 = st.tabs(["Users", "Models", "Tools"])
-    
-    # Display each dataframe in its respective tab
-    with tab1:
-        st.dataframe(users_df_view)
-    with tab2:
-        st.dataframe(models_df_view)
-    with tab3:
-        st.dataframe(tools_df_view) 
\ No newline at end of file
+    views = {"Users": users_df_view, "Models": models_df_view, "Tools": tools_df_view}
+    # Unlike st.tabs, which renders every tab on each run, only the selected table is built
+    selected = st.segmented_control("Table", list(views), default="Users", key="explore_table",
+                                    label_visibility="collapsed") or "Users"
+
+    # week_start is kept as a datetime column and only displayed as a date
+    column_config = {"week_start": st.column_config.DateColumn("week_start")}
+
+    show_table(
+        views[selected],
+        key=f"explore_{selected.lower()}",
+        view_key=None if view_key is None else (selected,) + tuple(view_key),
+        column_config=column_config
+    )
+
+    # Export the whole filtered view of the selected table, with the cohort and date filters of the page
+    if view_key is not None:
+        show_export(views[selected], selected.lower(), view_key)
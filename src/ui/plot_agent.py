@@ -1,10 +1,95 @@
+import hashlib
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-from core.llm_client import get_visualization_code, GEMINI_API_KEY, OPENAI_API_KEY
+from core.llm_cache import LLMResponseCache
+from core.llm_client import get_visualization_code, generate_concurrently, visualization_cache_key, clean_code
+from core.llm_providers import GEMINI_API_KEY, OPENAI_API_KEY, MODELS
+from core.prompt_profile import profile_dataframe
+from core.sandbox import SandboxPool
+from core.views import ViewCache
+from ui.sidebar import get_view_cache
 
-def show_plot_agent(users_df_view, models_df_view, tools_df_view):
-    """Renders the AI plotting agent interface."""
+# The number of rendered figures kept across reruns, least recently used evicted first
+FIGURE_CACHE_MAX_ENTRIES = 64
+
+@st.cache_resource
+def get_llm_cache():
+    """Returns the LLM response cache shared by all sessions of this process."""
+    return LLMResponseCache()
+
+@st.cache_resource
+def get_figure_cache():
+    """Returns the cache of figures built by generated code, shared by all sessions of this process."""
+    return ViewCache(max_entries=FIGURE_CACHE_MAX_ENTRIES)
+
+@st.cache_resource
+def get_sandbox():
+    """
+    Returns the pool of worker processes running generated code, shared by all
+    sessions of this process. It is started by the first chart to run, so servers
+    where nobody uses the Plot Agent don't start any workers.
+    """
+    return SandboxPool()
+
+# Modes that ask both models concurrently: keep the first valid chart, or show both side by side
+FASTEST_MODE = "Fastest of both"
+COMPARE_MODE = "Compare both"
+
+def run_plot_code(code, df, df_key=None):
+    """
+    Executes generated code against a view in the sandbox's worker processes, under
+    time and memory limits, and returns the `fig` it creates, if any.
+    """
+    fig_json = get_sandbox().run(clean_code(code), df, df_key)
+    if fig_json is None:
+        return None
+    # Plotly is only imported once there is a chart to render
+    import plotly.io as pio
+    return pio.from_json(fig_json)
+
+def keep_generated_code(result, df):
+    """Makes a generated result the current chart, remembering the model it came from for refinements."""
+    st.session_state.generated_code = result.code
+    st.session_state.generated_model = result.model
+    st.session_state.generated_code_key = visualization_cache_key(st.session_state.user_request, df, result.model)
+
+def cached_plot(code, df, df_key):
+    """
+    Returns the figure of generated code, running it only once per (code, view, data
+    version). Reruns that don't change the code or the data, e.g. showing the code
+    or typing feedback, re-render the cached figure. Code that fails is not cached.
+    df_key identifies the view, including the data version, or is None to always run.
+    """
+    if df_key is None:
+        return run_plot_code(code, df)
+    code_hash = hashlib.sha256(code.encode()).hexdigest()
+    return get_figure_cache().get(('figure', code_hash) + tuple(df_key), lambda: run_plot_code(code, df, df_key))
+
+def show_comparison(df, df_key):
+    """Renders the charts of all models side by side, each with a button to keep it."""
+    results = st.session_state.comparison
+    for col, result in zip(st.columns(len(results)), results):
+        with col:
+            st.subheader(result.model)
+            if result.error:
+                st.error(result.error)
+                continue
+            st.caption(f"Generated in {result.seconds:.1f}s")
+            try:
+                fig = cached_plot(result.code, df, df_key)
+            except Exception as e:
+                st.error(f"An error occurred while executing the generated code: {e}")
+                continue
+            st.plotly_chart(fig, key=f"comparison_{result.model}")
+            if st.button("Keep this chart", key=f"keep_{result.model}", use_container_width=True):
+                keep_generated_code(result, df)
+                del st.session_state.comparison
+                st.rerun()
+
+def show_plot_agent(users_df_view, models_df_view, tools_df_view, view_key=None):
+    """
+    Renders the AI plotting agent interface. view_key is the cache key of the views,
+    used to compute the prompt profile of each view only once per data version.
+    """
     
     st.header("Plot Agent")
 
@@ -21,14 +106,21 @@ def show_plot_agent(users_df_view, models_df_view, tools_df_view):
             options=list(dataframes.keys()),
             horizontal=True,
         )
-    # Get the selected dataframe
+    # Get the selected dataframe, and the key identifying it and its data version
     df = dataframes[selected_df_name]
+    df_key = None if view_key is None else (selected_df_name,) + tuple(view_key)
+
+    def df_profile():
+        """Returns the prompt profile of the selected view, computed once per view and data version."""
+        if view_key is None:
+            return profile_dataframe(df)
+        return get_view_cache().get(('profile',) + df_key, lambda: profile_dataframe(df))
 
     # Column 2: Model selection
     with col2:
         model = st.radio(
             "Choose a model:",
-            ("Gemini 1.5 Flash", "ChatGPT 4o"),
+            MODELS + (FASTEST_MODE, COMPARE_MODE),
             horizontal=True,
             key="model"
         )
@@ -68,35 +160,76 @@ def show_plot_agent(users_df_view, models_df_view, tools_df_view):
                 st.error("GEMINI_API_KEY not found. Please set it in your .env file.")
             elif model == "ChatGPT 4o" and not OPENAI_API_KEY:
                 st.error("OPENAI_API_KEY not found. Please set it in your .env file.")
+            elif model not in MODELS and not (GEMINI_API_KEY or OPENAI_API_KEY):
+                st.error("No API key found. Please set GEMINI_API_KEY or OPENAI_API_KEY in your .env file.")
+
+            # Ask both models at once, keeping the first valid chart or both for comparison
+            elif model not in MODELS:
+                with st.spinner("Generating visualizations with both models..."):
+                    results = generate_concurrently(
+                        st.session_state.user_request, df,
+                        compare=(model == COMPARE_MODE),
+                        cache=get_llm_cache(),
+                        df_profile=df_profile()
+                    )
+                st.session_state.generated_code = None
+                st.session_state.feedback = ""
+                valid = [result for result in results if not result.error]
+                if model == COMPARE_MODE and valid:
+                    st.session_state.comparison = results
+                elif valid:
+                    keep_generated_code(valid[0], df)
+                else:
+                    for result in results:
+                        st.error(f"{result.model}: {result.error}")
 
             # Generate visualization if all checks pass
             else:
                 with st.spinner(f"Generating visualization with {model}..."):
                     try:
-                        # Call LLM to generate visualization code
+                        # Call LLM to generate visualization code, unless the same request was answered before.
+                        # The code is shown as it streams in, and replaced by the chart once complete.
+                        streamed_code = st.empty()
                         st.session_state.generated_code = get_visualization_code(
                             user_request=st.session_state.user_request,
                             df_for_prompt=df,
                             model=model,
+                            cache=get_llm_cache(),
+                            df_profile=df_profile(),
+                            on_chunk=lambda code: streamed_code.code(code, language='python')
+                        )
+                        streamed_code.empty()
+                        st.session_state.generated_model = model
+                        st.session_state.generated_code_key = visualization_cache_key(
+                            st.session_state.user_request, df, model
                         )
                         st.session_state.feedback = "" # Clear previous feedback
                     except Exception as e:
                         st.error(str(e))
                         st.session_state.generated_code = None
 
+    # Repeated requests are answered from the shared response cache
+    llm_cache = get_llm_cache()
+    if llm_cache.hits or llm_cache.misses:
+        st.caption(f"Response cache: {llm_cache.hits} hit(s), {llm_cache.misses} miss(es) since the server started.")
+
     # Clear session button
     with col_clear:
         if st.button("Clear", use_container_width=True):
             # Clear all session state variables related to plotting agent
-            keys_to_clear = ['generated_code', 'feedback', 'user_request', 'last_selected_df', 'show_code']
+            keys_to_clear = ['generated_code', 'generated_code_key', 'generated_model', 'comparison', 'feedback', 'user_request', 'last_selected_df', 'show_code']
             for key in keys_to_clear:
                 if key in st.session_state:
                     del st.session_state[key]
             st.rerun()  # Refresh the page to reflect changes
 
+    # Display the charts of both models until one of them is kept
+    if st.session_state.get('comparison'):
+        show_comparison(df, df_key)
+
     # Display generated visualization and provide refinement options
     # This block runs if code has been generated successfully
-    if 'generated_code' in st.session_state and st.session_state.generated_code:
+    elif 'generated_code' in st.session_state and st.session_state.generated_code:
         try:
             # Toggle button for showing/hiding the generated code
             if st.button("Show/Hide Generated Code"):
@@ -107,17 +240,7 @@ def show_plot_agent(users_df_view, models_df_view, tools_df_view):
                 st.code(st.session_state.generated_code, language='python')
             
             # Execute the generated code to create the visualization
-            # Clean up any markdown formatting that might be present
-            code_to_execute = st.session_state.generated_code.strip().replace("```python", "").replace("```", "")
-            
-            # Set up execution environment with required variables
-            local_scope = {"df": df, "px": px, "pd": pd}
-            
-            # Execute the generated code
-            exec(code_to_execute, {}, local_scope)
-            
-            # Extract the figure object from the executed code
-            fig = local_scope.get("fig")
+            fig = cached_plot(st.session_state.generated_code, df, df_key)
             
             if fig:
                 # Display the generated plot
@@ -136,15 +259,24 @@ def show_plot_agent(users_df_view, models_df_view, tools_df_view):
                     if not feedback:
                         st.warning("Please enter your feedback before regenerating.")
                     else:
-                        # Generate refined visualization based on feedback
-                        with st.spinner(f"Regenerating visualization with {model}..."):
+                        # Generate refined visualization based on feedback, with the model the chart came from
+                        refine_model = st.session_state.get('generated_model', model)
+                        with st.spinner(f"Regenerating visualization with {refine_model}..."):
                             try:
+                                previous_code = st.session_state.generated_code
+                                streamed_code = st.empty()
                                 st.session_state.generated_code = get_visualization_code(
                                     user_request=st.session_state.user_request,
                                     df_for_prompt=df,
-                                    model=model,
-                                    previous_code=st.session_state.generated_code,
-                                    feedback=feedback
+                                    model=refine_model,
+                                    previous_code=previous_code,
+                                    feedback=feedback,
+                                    cache=get_llm_cache(),
+                                    df_profile=df_profile(),
+                                    on_chunk=lambda code: streamed_code.code(code, language='python')
+                                )
+                                st.session_state.generated_code_key = visualization_cache_key(
+                                    st.session_state.user_request, df, refine_model, previous_code, feedback
                                 )
                                 st.rerun() # Rerun to display the new chart
                             except Exception as e:
@@ -157,4 +289,7 @@ def show_plot_agent(users_df_view, models_df_view, tools_df_view):
         except Exception as e:
             # Handle any errors during code execution
             st.error(f"An error occurred while executing the generated code: {e}")
-            st.session_state.generated_code = None # Clear broken code to prevent repeated errors 
\ No newline at end of file
+            st.session_state.generated_code = None # Clear broken code to prevent repeated errors
+            # Don't serve the broken code from the cache again
+            if st.session_state.get('generated_code_key'):
+                get_llm_cache().discard(st.session_state.generated_code_key) 
\ No newline at end of file
@@ -0,0 +1,47 @@
+import streamlit as st
+import pandas as pd
+from core.retention import weekly_active_users, rolling_active_users, retention_matrix, weekly_churn
+
+def show_retention(activity):
+    """
+    Renders the adoption section: weekly and rolling 4-week active users, week-over-week
+    churn, and the retention of every week's active users over the following weeks.
+    Covers all uploaded weeks of the selected cohort.
+    """
+    st.header("Adoption & Retention")
+
+    if not len(activity.keys):
+        st.info("Upload at least one week of data to see adoption and retention.")
+        return
+
+    active = pd.concat([weekly_active_users(activity), rolling_active_users(activity, window=4)], axis=1)
+    churn = weekly_churn(activity)
+    latest = churn.iloc[-1]
+
+    # Headline numbers of the most recent week
+    cols = st.columns(4)
+    cols[0].metric("Weekly Active Users", f"{int(latest['active']):,}")
+    cols[1].metric("4-Week Active Users", f"{int(active.iloc[-1, 1]):,}")
+    cols[2].metric(
+        "Retained From Last Week",
+        f"{int(latest['retained']):,}" if pd.notna(latest['retained']) else "–"
+    )
+    cols[3].metric(
+        "Weekly Churn",
+        f"{latest['churn_rate']:.1f}%" if pd.notna(latest['churn_rate']) else "–"
+    )
+
+    trend_col, retention_col = st.columns(2)
+    with trend_col:
+        st.subheader("Active Users")
+        st.line_chart(active.rename(columns={'active_users': 'Weekly', 'active_users_4w': 'Rolling 4 weeks'}))
+    with retention_col:
+        st.subheader("Retention (% still active N weeks later)")
+        matrix = retention_matrix(activity, max_weeks=8)
+        matrix.index = matrix.index.strftime('%Y-%m-%d')
+        matrix.columns = [f"+{weeks}w" for weeks in matrix.columns]
+        st.dataframe(
+            matrix.iloc[::-1],
+            column_config={col: st.column_config.NumberColumn(format="%.0f%%") for col in matrix.columns},
+            use_container_width=True
+        )
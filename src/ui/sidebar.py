@@ -1,7 +1,34 @@
 import streamlit as st
 import pandas as pd
-from datetime import datetime
-from core.data import save_master_dataframes, process_uploaded_file
+from core.cohorts import ALL_USERS
+from core.data import (
+    save_week_partitions, delete_week_partition, load_week_partitions, process_uploaded_file,
+    process_csv_in_chunks, STREAMING_THRESHOLD_BYTES
+)
+from core.ingest import ingest_files, file_digest, IngestCache
+from core.query import duckdb_available
+from core.store import MasterStore
+from core.views import ViewCache
+
+@st.cache_resource
+def get_master_store():
+    """
+    Returns the master data store shared by all sessions of this process.
+    Startup only reads the weekly rollups; the fact tables are loaded on first use.
+    """
+    return MasterStore()
+
+@st.cache_resource
+def get_view_cache():
+    """Returns the cache of filtered views shared by all sessions of this process."""
+    return ViewCache()
+
+def stored_weeks(snapshot):
+    """Returns the sorted dates of the weeks in a snapshot of the master data, read from the rollups."""
+    return get_view_cache().get(
+        ('weeks', snapshot.version),
+        lambda: sorted(pd.to_datetime(snapshot.rollups['users']['week_start']).dt.date.unique())
+    )
 
 def handle_date_deletion(date_to_delete):
     """
@@ -11,17 +38,13 @@ def handle_date_deletion(date_to_delete):
         # Convert the date to a datetime object to ensure correct filtering
         date_to_delete = pd.to_datetime(date_to_delete)
 
-        # Filter out the data for the given date
-        st.session_state.users_df = st.session_state.users_df[pd.to_datetime(st.session_state.users_df['week_start']) != date_to_delete]
-        st.session_state.models_df = st.session_state.models_df[pd.to_datetime(st.session_state.models_df['week_start']) != date_to_delete]
-        st.session_state.tools_df = st.session_state.tools_df[pd.to_datetime(st.session_state.tools_df['week_start']) != date_to_delete]
-
-        # Save the updated dataframes
-        save_master_dataframes(
-            st.session_state.users_df,
-            st.session_state.models_df,
-            st.session_state.tools_df
-        )
+        # Drop the week's partition from the master store; the file's processed
+        # output stays in the ingest cache, so uploading it again is cheap
+        store = get_master_store()
+        with store.lock:
+            delete_week_partition(date_to_delete)
+            IngestCache().forget_week(date_to_delete)
+            store.delete_weeks([date_to_delete])
         st.toast(f"Successfully deleted all data for {date_to_delete.date()}.", icon="✅")
         st.rerun()  # Rerun the app to reflect the changes immediately
         
@@ -39,52 +62,119 @@ def handle_file_upload():
 
     try:
         # --- PERMANENT DUPLICATE CHECK ---
-        # Extract the date from the filename to check against existing master data.
-        report_date_str = uploaded_file.name.split(' ')[-1].replace('.csv', '')
-        report_date = pd.to_datetime(datetime.strptime(report_date_str, '%Y-%m-%d'))
+        # Files are identified by the hash of their bytes, not by their name
+        digest = file_digest(uploaded_file)
+        # Uploads from concurrent sessions are applied one at a time
+        store = get_master_store()
+        with store.lock:
+            cache = IngestCache()
 
-        # Check if this date already exists in our master users dataframe
-        if not st.session_state.users_df.empty and report_date in pd.to_datetime(st.session_state.users_df['week_start']).values:
-            st.sidebar.warning(f"A report for the date {report_date.date()} has already been uploaded.")
-        else:
-            # If it's a new date, process the file
-            df = pd.read_csv(uploaded_file)
-            new_users, new_models, new_tools = process_uploaded_file(df, uploaded_file.name)
-            
-            # Append new data TO THE DATAFRAMES IN SESSION STATE
-            st.session_state.users_df = pd.concat([st.session_state.users_df, new_users], ignore_index=True)
-            st.session_state.models_df = pd.concat([st.session_state.models_df, new_models], ignore_index=True)
-            st.session_state.tools_df = pd.concat([st.session_state.tools_df, new_tools], ignore_index=True)
-            
-            # Save the UPDATED master dataframes for persistence
-            save_master_dataframes(
-                st.session_state.users_df, 
-                st.session_state.models_df, 
-                st.session_state.tools_df
-            )
-            st.sidebar.success("File processed and master data updated!")
+            if cache.is_current(digest):
+                st.sidebar.info("This file has already been uploaded; the master data is unchanged.")
+                return
+
+            skipped_cells = 0
+            if cache.contains(digest):
+                # Seen before: put its processed weeks back without parsing it again
+                weeks = cache.restore(digest)
+                new_users, new_models, new_tools = load_week_partitions(weeks)
+            elif uploaded_file.size > STREAMING_THRESHOLD_BYTES:
+                # Very large exports are streamed into the master store chunk by chunk,
+                # then only the new weeks are read back
+                weeks, skipped_cells = process_csv_in_chunks(uploaded_file)
+                new_users, new_models, new_tools = load_week_partitions(weeks)
+                cache.store(digest, uploaded_file.name, weeks)
+            else:
+                df = pd.read_csv(uploaded_file)
+                new_users, new_models, new_tools = process_uploaded_file(df, uploaded_file.name)
+                skipped_cells = new_models.attrs.get('skipped_cells', 0) + new_tools.attrs.get('skipped_cells', 0)
+
+                # Persist only the new week's partitions, replacing a previous upload of that week
+                save_week_partitions(new_users, new_models, new_tools)
+                weeks = list(pd.to_datetime(new_users['week_start'].unique()))
+                cache.store(digest, uploaded_file.name, weeks)
+            cache.mark_current(digest, weeks)
+
+            # A corrected export replaces the data of its weeks only
+            store.replace_weeks(weeks, new_users, new_models, new_tools)
+        st.sidebar.success("File processed and master data updated!")
+
+        # Report dictionary cells that could not be parsed and were left out
+        if skipped_cells:
+            st.sidebar.warning(f"Skipped {skipped_cells} malformed model/tool usage cell(s).")
 
     except Exception as e:
         st.sidebar.error(f"Error processing file: {e}")
 
-def show_sidebar():
-    """Renders the sidebar components and returns the filter states."""
+def handle_bulk_upload():
+    """
+    This function is called when the bulk upload button is clicked.
+    It processes all selected files in parallel and commits them in a single write.
+    """
+    uploaded_files = st.session_state.get("bulk_uploader_widget") or []
+    if not uploaded_files:
+        st.sidebar.warning("Select one or more CSV files to upload.")
+        return
+
+    try:
+        # Processed weeks are written to the master store in a single write, then read back
+        store = get_master_store()
+        with store.lock:
+            weeks, report = ingest_files(
+                [(uploaded_file.name, uploaded_file.getvalue()) for uploaded_file in uploaded_files]
+            )
+            if weeks:
+                store.replace_weeks(weeks, *load_week_partitions(weeks))
+
+        if weeks:
+            st.sidebar.success(
+                f"Processed {len(report['processed']) + len(report['restored'])} file(s) and updated the master data!"
+            )
+
+        if report['unchanged']:
+            st.sidebar.info(f"Skipped {len(report['unchanged'])} file(s) that were already uploaded.")
+        if report['duplicates']:
+            st.sidebar.warning(f"Skipped {len(report['duplicates'])} file(s) repeating the date of another file.")
+        for filename, error in report['failed']:
+            st.sidebar.error(f"Error processing {filename}: {error}")
+        if report['skipped_cells']:
+            st.sidebar.warning(f"Skipped {report['skipped_cells']} malformed model/tool usage cell(s).")
+
+    except Exception as e:
+        st.sidebar.error(f"Error processing files: {e}")
+
+def show_sidebar(snapshot):
+    """Renders the sidebar components for a snapshot of the master data and returns the filter states."""
     st.sidebar.header("Filters")
 
-    # --- PM Filter ---
-    st.sidebar.subheader("User Type")
-    pm_only = st.sidebar.checkbox("Show PM only")
+    # --- Cohort Filter ---
+    st.sidebar.subheader("Cohort")
+    cohort = st.sidebar.selectbox(
+        "Show users in",
+        [ALL_USERS] + list(snapshot.cohorts),
+        format_func=lambda name: "All users" if name == ALL_USERS else name,
+        key="cohort"
+    )
     
     # --- Time Filter ---
     start_date, end_date = None, None
-    if not st.session_state.users_df.empty:
+    weeks = stored_weeks(snapshot)
+    if weeks:
         st.sidebar.subheader("Date Range")
-        min_date = pd.to_datetime(st.session_state.users_df['week_start']).dt.date.min()
-        max_date = pd.to_datetime(st.session_state.users_df['week_start']).dt.date.max()
+        min_date, max_date = weeks[0], weeks[-1]
 
         start_date = st.sidebar.date_input("From", value=min_date, min_value=min_date, max_value=max_date)
         end_date = st.sidebar.date_input("To", value=max_date, min_value=min_date, max_value=max_date)
 
+    # --- Query Engine ---
+    # DuckDB is optional: the picker is only offered when it is installed
+    query_engine = "pandas"
+    if duckdb_available():
+        st.sidebar.subheader("Query Engine")
+        query_engine = st.sidebar.radio(
+            "Run filters and KPIs with", ["pandas", "DuckDB"], horizontal=True, key="query_engine"
+        )
+
     st.sidebar.divider()
 
     st.sidebar.header("Upload Weekly Data")
@@ -94,12 +184,17 @@ def show_sidebar():
         key="file_uploader_widget",
         on_change=handle_file_upload
     )
+    with st.sidebar.expander("Bulk Upload", expanded=False):
+        st.file_uploader(
+            "Upload several CSV files",
+            type=['csv'],
+            accept_multiple_files=True,
+            key="bulk_uploader_widget"
+        )
+        st.button("Process Files", on_click=handle_bulk_upload, use_container_width=True)
     with st.sidebar.expander("Processed Report Dates", expanded=False):
-        if not st.session_state.users_df.empty:
-            processed_dates = pd.to_datetime(st.session_state.users_df['week_start']).dt.date.unique()
-            processed_dates = sorted(processed_dates, reverse=True)
-            
-            for date in processed_dates:
+        if weeks:
+            for date in reversed(weeks):
                 col1, col2 = st.columns([0.8, 0.2])
                 with col1:
                     st.write(date.strftime('%Y-%m-%d'))
@@ -109,4 +204,4 @@ def show_sidebar():
         else:
             st.write("No reports have been uploaded yet.")
 
-    return pm_only, start_date, end_date 
\ No newline at end of file
+    return cohort, start_date, end_date, query_engine 
\ No newline at end of file
@@ -0,0 +1,82 @@
+import math
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from ui.sidebar import get_view_cache
+
+PAGE_SIZES = [25, 50, 100, 250]
+
+def search_rows(df, query):
+    """
+    Returns the rows of a view with any text column containing the query (case-insensitive).
+    Text columns are categorical, so each distinct value is matched once and the
+    rows are selected through the category codes.
+    """
+    if not query:
+        return df
+    mask = np.zeros(len(df), dtype=bool)
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            matches = df[col].cat.categories.astype(str).str.contains(query, case=False, regex=False)
+            codes = df[col].cat.codes.to_numpy()
+            # Missing values have code -1, which never matches
+            mask |= np.append(matches, False)[codes]
+        elif df[col].dtype == object:
+            mask |= df[col].astype(str).str.contains(query, case=False, regex=False).to_numpy()
+    return df[mask]
+
+def sort_rows(df, sort_by, ascending):
+    """Sorts a view by one column, keeping the view's order for ties. No column keeps the view's order."""
+    if not sort_by:
+        return df
+    return df.sort_values(sort_by, ascending=ascending, kind='stable', na_position='last')
+
+def show_table(df, key, view_key=None, column_config=None):
+    """
+    Renders a view as a paginated table. Search, sorting, column selection and
+    pagination run on the server, and only the visible page is sent to the browser.
+    The searched and sorted rows are memoized on the view's key, so paging through
+    them does not search or sort again.
+
+    Args:
+        df (pd.DataFrame): The view to show.
+        key (str): A unique widget key prefix, e.g. the tab name.
+        view_key (tuple): The cache key of the view (including the data version),
+            or None to search and sort on every rerun.
+        column_config (dict): The column configuration passed to st.dataframe.
+    """
+    search_col, sort_col, order_col = st.columns([0.5, 0.3, 0.2])
+    with search_col:
+        query = st.text_input("Search", key=f"{key}_search", placeholder="Search text columns")
+    with sort_col:
+        sort_by = st.selectbox("Sort by", [None] + list(df.columns), format_func=lambda col: col or "(newest first)",
+                               key=f"{key}_sort_by")
+    with order_col:
+        ascending = st.radio("Order", ["Asc", "Desc"], horizontal=True, key=f"{key}_order") == "Asc"
+    columns = st.multiselect("Columns", list(df.columns), default=list(df.columns), key=f"{key}_columns")
+
+    def build():
+        return sort_rows(search_rows(df, query), sort_by, ascending)
+
+    if view_key is None or not (query or sort_by):
+        rows = build()
+    else:
+        rows = get_view_cache().get(('table', key, query, sort_by, ascending) + tuple(view_key), build)
+
+    # --- Pagination ---
+    size_col, page_col, count_col = st.columns([0.25, 0.25, 0.5])
+    with size_col:
+        page_size = st.selectbox("Rows per page", PAGE_SIZES, index=1, key=f"{key}_page_size")
+    n_pages = max(1, math.ceil(len(rows) / page_size))
+    # A narrower search or larger page size can leave the current page out of range
+    if st.session_state.get(f"{key}_page", 1) > n_pages:
+        st.session_state[f"{key}_page"] = 1
+    with page_col:
+        page = st.number_input("Page", min_value=1, max_value=n_pages, step=1, key=f"{key}_page")
+    start = (page - 1) * page_size
+    with count_col:
+        st.caption(f"Rows {min(start + 1, len(rows)):,}–{min(start + page_size, len(rows)):,} of {len(rows):,}"
+                   f" ({len(df):,} in view)")
+
+    st.dataframe(rows.iloc[start:start + page_size][columns], column_config=column_config, hide_index=True)
@@ -0,0 +1,36 @@
+import pandas as pd
+import pandas.testing as tm
+
+from core.data import (
+    process_uploaded_file, process_csv_in_chunks, save_week_partitions, load_week_partitions, list_stored_weeks
+)
+from synthetic import make_export
+
+
+def _export(tmp_path):
+    """Writes a three-week export with some malformed usage cells and rows without an email."""
+    df = pd.concat(
+        [make_export(40, week, seed=i) for i, week in enumerate(['2025-03-23', '2025-03-30', '2025-04-06'])],
+        ignore_index=True
+    ).sample(frac=1, random_state=0)
+    df.loc[df.index[:3], 'model_to_messages'] = "{'gpt-4o': 3"
+    df.loc[df.index[3:5], 'email'] = None
+    csv_file = tmp_path / 'ChatGPT Enterprise Users 2025-04-06.csv'
+    df.to_csv(csv_file, index=False)
+    return csv_file
+
+
+def test_chunked_partitions_match_whole_file(tmp_path):
+    csv_file = _export(tmp_path)
+    whole_path, chunked_path = tmp_path / 'whole', tmp_path / 'chunked'
+
+    frames = process_uploaded_file(pd.read_csv(csv_file), csv_file.name)
+    save_week_partitions(*frames, whole_path)
+    weeks, skipped_cells = process_csv_in_chunks(str(csv_file), chunked_path, chunksize=7)
+
+    assert weeks == list_stored_weeks(whole_path) == list_stored_weeks(chunked_path)
+    assert skipped_cells == frames[1].attrs['skipped_cells'] + frames[2].attrs['skipped_cells'] == 3
+    for week in weeks:
+        for whole_df, chunked_df in zip(load_week_partitions([week], whole_path), load_week_partitions([week], chunked_path)):
+            # Partitions hold the same rows; only the unused dictionary entries of categories may differ
+            tm.assert_frame_equal(chunked_df, whole_df, check_categorical=False)
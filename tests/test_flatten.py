@@ -0,0 +1,52 @@
+import ast
+
+import pandas as pd
+
+from core.data import _flatten_data
+
+CELLS = [
+    "{'gpt-4o': 20, 'o3': 6}",
+    '{"gpt-4o": 3, \'o3\': -1}',
+    "{ 'gpt-4o' : 1 ,'o3':2, }",
+    "{}",
+    "{ }",
+    "{'gpt-4o': 2, 'o3': 5, 'gpt-4o': 7}",
+    "{'gpt-4o': 1.5, 'o3': 2}",
+    "{'it\\'s': 4, 'a,b': 1, 'c:d': 2}",
+    '{"quote\\"d": 1, \'tab\\t\': 2}',
+    "{'big': 123456789012345678901234}",
+    "{'gpt-4o': 1, 'o3': }",
+    "{'unterminated: 1}",
+    "{1: 2}",
+    "{'nested': {'a': 1}}",
+    "",
+    "0",
+    None,
+    "{'o3': 1, 'o3': 2, 'gpt-4o': 3, 'o3': 4}",
+]
+
+
+def _reference(df):
+    """Flattens the cells one by one with ast.literal_eval, the parser the bulk path replaces."""
+    records, skipped = [], 0
+    for email, cell in zip(df['email'], df['model_to_messages']):
+        if cell is None or not str(cell).startswith('{'):
+            continue
+        try:
+            parsed = ast.literal_eval(cell)
+        except (ValueError, SyntaxError):
+            skipped += 1
+            continue
+        records.extend((email, key, value) for key, value in parsed.items())
+    return records, skipped
+
+
+def test_bulk_parser_matches_literal_eval():
+    df = pd.DataFrame({
+        'email': [f"user{i}@example.com" for i in range(len(CELLS))],
+        'model_to_messages': CELLS,
+    })
+    flat = _flatten_data(df, ['email'], 'model_to_messages', ['model', 'messages'])
+    records, skipped = _reference(df)
+    assert list(zip(flat['email'], flat['model'], flat['messages'])) == records
+    assert flat.attrs['skipped_cells'] == skipped
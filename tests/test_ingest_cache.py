@@ -0,0 +1,46 @@
+import time
+
+from core.ingest import IngestCache, file_digest, ingest_files
+from synthetic import make_export
+
+
+def _exports(tmp_path, weeks):
+    sources = []
+    for i, week in enumerate(weeks):
+        csv_file = tmp_path / f"ChatGPT Enterprise Users {week}.csv"
+        make_export(30, week, seed=i).to_csv(csv_file, index=False)
+        sources.append((csv_file.name, str(csv_file)))
+    return sources
+
+
+def test_least_recently_used_files_are_evicted(tmp_path):
+    (first,) = _exports(tmp_path, ['2025-03-23'])
+    ingest_files([first], tmp_path, max_workers=1)
+    digest = file_digest(first[1])
+    cache = IngestCache(tmp_path)
+    assert cache.contains(digest)
+
+    # Replacing the first file's week leaves its output unused, then the cache is full
+    cache.manifest['files'][digest]['used'] = time.time() - 60
+    cache._save()
+    corrected = tmp_path / 'Corrected 2025-03-23.csv'
+    make_export(30, '2025-03-23', seed=5).to_csv(corrected, index=False)
+    ingest_files([(corrected.name, str(corrected))], tmp_path, max_workers=1)
+    cache = IngestCache(tmp_path, max_bytes=1)
+    cache._evict()
+    cache._save()
+
+    cache = IngestCache(tmp_path)
+    assert not cache.contains(digest) and digest not in cache.manifest['files']
+    # A file still backing its week is recognized without its cached partitions
+    current = file_digest(str(corrected))
+    assert cache.is_current(current) and not cache.contains(current)
+
+
+def test_expired_files_are_evicted(tmp_path):
+    (source,) = _exports(tmp_path, ['2025-03-23'])
+    ingest_files([source], tmp_path, max_workers=1)
+    cache = IngestCache(tmp_path, max_age_seconds=0)
+    time.sleep(0.01)
+    cache._evict()
+    assert not cache.contains(file_digest(source[1]))
@@ -0,0 +1,83 @@
+import asyncio
+import threading
+import time
+
+import pandas as pd
+
+from core import llm_client
+from core.llm_cache import LLMResponseCache
+from core.llm_client import generate_concurrently, PROVIDERS
+
+VALID_CODE = "fig = px.bar(df, x='model', y='messages')"
+DF = pd.DataFrame({'model': ['gpt-4o', 'o3'], 'messages': [3, 5]})
+
+
+def _stub(code, delay, calls=None, cancelled=None):
+    """An async provider answering `code` after `delay` seconds, recording calls and cancellations."""
+    async def call(prompt, user_request):
+        if calls is not None:
+            calls.append(user_request)
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            if cancelled is not None:
+                cancelled.set()
+            raise
+        return code
+    return call
+
+
+def test_first_valid_response_wins_and_cancels_the_other():
+    cancelled = threading.Event()
+    providers = {'fast': _stub(VALID_CODE, 0.01), 'slow': _stub(VALID_CODE, 10, cancelled=cancelled)}
+    start = time.perf_counter()
+    (result,) = generate_concurrently("bar chart", DF, models=('slow', 'fast'), providers=providers)
+    assert result.model == 'fast' and result.error is None
+    assert time.perf_counter() - start < 5 and cancelled.is_set()
+
+
+def test_invalid_response_does_not_win():
+    providers = {'fast': _stub("print('no chart')", 0.01), 'slow': _stub(VALID_CODE, 0.1)}
+    (result,) = generate_concurrently("bar chart", DF, models=('fast', 'slow'), providers=providers)
+    assert result.model == 'slow'
+
+
+def test_compare_waits_for_every_model_and_reports_errors():
+    providers = {'a': _stub(VALID_CODE, 0.05), 'b': _stub("fig = (", 0.01), 'c': _stub(VALID_CODE, 10)}
+    results = generate_concurrently(
+        "bar chart", DF, models=('a', 'b', 'c'), providers=providers, compare=True, timeout=0.5
+    )
+    assert [result.model for result in results] == ['a', 'b', 'c']
+    assert results[0].error is None
+    assert "not valid Python" in results[1].error
+    assert "did not respond" in results[2].error
+
+
+def test_cached_response_skips_the_providers(tmp_path):
+    cache = LLMResponseCache(tmp_path)
+    calls = []
+    providers = {'a': _stub(VALID_CODE, 0.01, calls), 'b': _stub(VALID_CODE, 0.01, calls)}
+    generate_concurrently("bar chart", DF, models=('a', 'b'), providers=providers, cache=cache, compare=True)
+    assert len(calls) == 2
+    (result,) = generate_concurrently("bar chart", DF, models=('a', 'b'), providers=providers, cache=cache)
+    assert result.code == VALID_CODE and len(calls) == 2
+
+
+def test_blocking_provider_is_cancelled(monkeypatch):
+    """The real providers run blocking calls on threads; losing the race must stop them."""
+    started, cancelled = threading.Event(), threading.Event()
+
+    def generate_code(model, prompt, user_request, cancel):
+        if model == llm_client.MODELS[0]:
+            # Only win once the other call is underway, so there is a running call to cancel
+            started.wait(5)
+            return VALID_CODE
+        started.set()
+        if cancel.wait(10):
+            cancelled.set()
+        return VALID_CODE
+
+    monkeypatch.setattr(llm_client, 'generate_code', generate_code)
+    (result,) = generate_concurrently("bar chart", DF, models=llm_client.MODELS, providers=PROVIDERS)
+    assert result.model == llm_client.MODELS[0]
+    assert cancelled.wait(5)
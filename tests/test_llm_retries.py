@@ -0,0 +1,48 @@
+import threading
+
+import pytest
+
+from core import llm_providers
+
+
+def test_cancelling_during_the_backoff_skips_the_retry(monkeypatch):
+    monkeypatch.setattr(llm_providers, 'backoff_delay', lambda attempt: 30)
+    calls = []
+    called = threading.Event()
+    cancel = threading.Event()
+
+    def call():
+        calls.append(1)
+        called.set()
+        raise TimeoutError("stub timeout")
+
+    errors = []
+    def run():
+        try:
+            llm_providers._with_retries(call, (TimeoutError,), cancel)
+        except TimeoutError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    assert called.wait(5)
+    cancel.set()
+    thread.join(5)
+    assert not thread.is_alive()
+    assert len(calls) == 1 and len(errors) == 1
+
+
+def test_transient_errors_are_retried(monkeypatch):
+    monkeypatch.setattr(llm_providers, 'backoff_delay', lambda attempt: 0)
+    calls = []
+
+    def call():
+        calls.append(1)
+        if len(calls) < 3:
+            raise ConnectionError("stub connection reset")
+        return 'ok'
+
+    assert llm_providers._with_retries(call, (ConnectionError,), threading.Event()) == 'ok'
+    assert len(calls) == 3
+    with pytest.raises(ValueError):
+        llm_providers._with_retries(lambda: int('x'), (ConnectionError,))
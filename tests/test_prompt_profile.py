@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.prompt_profile import profile_dataframe, stratified_sample, estimate_tokens
+
+
+def _weekly_view(n_weeks, rows_per_week=5):
+    """A view of n_weeks weeks, newest week first like the filtered views."""
+    weeks = pd.date_range('2024-01-07', periods=n_weeks, freq='7D')
+    df = pd.DataFrame({
+        'week_start': np.repeat(weeks, rows_per_week),
+        'messages': np.arange(n_weeks * rows_per_week),
+    })
+    return df.iloc[::-1].reset_index(drop=True), weeks
+
+
+@pytest.mark.parametrize('n_weeks, n_rows', [(52, 12), (8, 3), (8, 12), (3, 12)])
+def test_sample_spans_oldest_to_newest_week(n_weeks, n_rows):
+    df, weeks = _weekly_view(n_weeks)
+    sample = stratified_sample(df, n_rows)
+    sampled_weeks = set(sample['week_start'])
+    assert len(sample) == n_rows
+    assert weeks[0] in sampled_weeks and weeks[-1] in sampled_weeks
+    assert len(sampled_weeks) == min(n_weeks, n_rows)
+    # Rows keep the view's order
+    assert sample.index.is_monotonic_increasing
+
+
+def test_profile_fits_the_token_budget():
+    df, _ = _weekly_view(52, rows_per_week=40)
+    df['model'] = pd.Categorical(np.resize([f"model-{i}" for i in range(30)], len(df)))
+    assert estimate_tokens(profile_dataframe(df, max_tokens=200)) <= 200
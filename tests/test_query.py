@@ -0,0 +1,66 @@
+import pandas as pd
+import pandas.testing as tm
+import pytest
+
+from core.cohorts import ALL_USERS, PM_COHORT, cohort_flag
+from core.data import process_uploaded_file, save_week_partitions
+from core.retention import build_weekly_activity, retention_matrix, weekly_active_users
+from core.rollups import select_rollups
+from core.store import MasterStore
+from core.views import build_filtered_views
+from synthetic import make_export
+
+query = pytest.importorskip('core.query')
+if not query.duckdb_available():
+    pytest.skip("DuckDB is not installed", allow_module_level=True)
+
+
+@pytest.fixture
+def store(tmp_path):
+    """A master store of four weeks, a later week renaming some users, and a PM cohort."""
+    for i, week in enumerate(['2025-03-23', '2025-03-30', '2025-04-06', '2025-04-13']):
+        df = make_export(60, week, seed=i)
+        if i == 3:
+            df.loc[:9, 'name'] = 'Renamed ' + df.loc[:9, 'name']
+        save_week_partitions(*process_uploaded_file(df, None), tmp_path)
+    pd.DataFrame({'email': [f"user{i}@company{i % 40}.com" for i in range(0, 60, 3)]}).to_csv(
+        tmp_path / 'pm_emails.csv', index=False
+    )
+    return MasterStore(tmp_path)
+
+
+@pytest.mark.parametrize('cohort', [ALL_USERS, PM_COHORT])
+@pytest.mark.parametrize('dates', [(None, None), (pd.Timestamp('2025-03-30').date(), pd.Timestamp('2025-04-06').date())])
+def test_duckdb_matches_pandas(store, cohort, dates):
+    snapshot = store.snapshot(facts=True)
+
+    pandas_views = build_filtered_views(snapshot, cohort, *dates)
+    duckdb_views = query.query_filtered_views(snapshot.cohorts, cohort, *dates, path=store.path)
+    for pandas_view, duckdb_view in zip(pandas_views, duckdb_views):
+        # Rows of the same week may come in another order; categories hold other unused values
+        sort = [col for col in pandas_view.columns if col != 'name']
+        tm.assert_frame_equal(
+            duckdb_view.sort_values(sort, ignore_index=True), pandas_view.sort_values(sort, ignore_index=True),
+            check_categorical=False
+        )
+
+    pandas_rollups = select_rollups(snapshot.rollups, cohort, *dates)
+    duckdb_rollups = query.query_weekly_rollups(snapshot.cohorts, cohort, *dates, path=store.path)
+    for table, pandas_df in pandas_rollups.items():
+        keys = list(pandas_df.columns[:3])
+        tm.assert_frame_equal(
+            duckdb_rollups[table].sort_values(keys, ignore_index=True),
+            pandas_df.sort_values(keys, ignore_index=True),
+            check_dtype=False
+        )
+
+
+@pytest.mark.parametrize('cohort', [ALL_USERS, PM_COHORT])
+def test_duckdb_activity_matches_pandas(store, cohort):
+    snapshot = store.snapshot(facts=True)
+    pandas_activity = build_weekly_activity(
+        snapshot.users_df, snapshot.week_index['users'], len(snapshot.user_dim), cohort_flag(snapshot.cohorts, cohort)
+    )
+    duckdb_activity = query.query_weekly_activity(snapshot.cohorts, cohort, path=store.path)
+    tm.assert_series_equal(weekly_active_users(duckdb_activity), weekly_active_users(pandas_activity))
+    tm.assert_frame_equal(retention_matrix(duckdb_activity), retention_matrix(pandas_activity))
@@ -0,0 +1,50 @@
+import pandas as pd
+
+from core.data import process_uploaded_file, save_week_partitions, delete_week_partition, load_master_data
+from core.store import MasterStore
+from synthetic import make_export
+
+
+def _write_week(path, week, seed):
+    """Writes a week's partitions like another process (e.g. the ingest CLI) would."""
+    save_week_partitions(*process_uploaded_file(make_export(25, week, seed), None), path)
+
+
+def _weeks(snapshot):
+    return sorted(snapshot.rollups['users']['week_start'].unique())
+
+
+def test_outside_writes_are_published(tmp_path):
+    _write_week(tmp_path, '2025-03-23', 0)
+    store = MasterStore(tmp_path)
+    version = store.snapshot().version
+
+    # Without the facts in memory, only the rollups are refreshed
+    _write_week(tmp_path, '2025-03-30', 1)
+    snapshot = store.snapshot()
+    assert snapshot.version > version and len(_weeks(snapshot)) == 2
+    assert store.snapshot().version == snapshot.version
+
+    # With the facts in memory, the changed weeks are replaced
+    store.snapshot(facts=True)
+    _write_week(tmp_path, '2025-03-30', 2)
+    delete_week_partition('2025-03-23', tmp_path)
+    _write_week(tmp_path, '2025-04-06', 3)
+    snapshot = store.snapshot(facts=True)
+    assert _weeks(snapshot) == [pd.Timestamp('2025-03-30'), pd.Timestamp('2025-04-06')]
+
+    _, fresh_users, _, _ = load_master_data(tmp_path, snapshot.cohorts)
+    assert snapshot.users_df['messages'].sum() == fresh_users['messages'].sum()
+    assert len(snapshot.users_df) == len(fresh_users) == 50
+
+
+def test_own_writes_are_not_reloaded(tmp_path):
+    _write_week(tmp_path, '2025-03-23', 0)
+    store = MasterStore(tmp_path)
+    store.snapshot(facts=True)
+
+    frames = process_uploaded_file(make_export(25, '2025-03-30', 1), None)
+    save_week_partitions(*frames, tmp_path)
+    store.replace_weeks([pd.Timestamp('2025-03-30')], *frames)
+    version = store.version
+    assert store.snapshot().version == version
@@ -0,0 +1,51 @@
+import pandas as pd
+
+from core.data import load_master_data, process_uploaded_file, save_week_partitions, delete_week_partition
+from core.store import MasterStore
+from synthetic import make_export
+
+
+def _names(user_dim):
+    return user_dim.set_index('email')['name'].astype(object).fillna('').sort_index()
+
+
+def _upload(store, path, df):
+    """Writes an export's week like the sidebar does, then publishes it."""
+    frames = process_uploaded_file(df, None)
+    save_week_partitions(*frames, path)
+    store.replace_weeks(list(pd.to_datetime(frames[0]['week_start'].unique())), *frames)
+
+
+def _assert_matches_fresh_load(store, path):
+    live = _names(store.snapshot(facts=True).user_dim)
+    fresh = _names(load_master_data(path, store.snapshot().cohorts)[0])
+    pd.testing.assert_series_equal(live, fresh.reindex(live.index, fill_value=''))
+
+
+def _export(week, prefix, seed=0):
+    df = make_export(20, week, seed)
+    df['name'] = prefix + df['name']
+    return df
+
+
+def test_names_follow_the_latest_week(tmp_path):
+    save_week_partitions(*process_uploaded_file(_export('2025-03-30', 'New '), None), tmp_path)
+    store = MasterStore(tmp_path)
+
+    # Backfilling an older week keeps the newer names
+    _upload(store, tmp_path, _export('2025-03-23', 'Old '))
+    assert _names(store.snapshot().user_dim).str.startswith('New ').all()
+    _assert_matches_fresh_load(store, tmp_path)
+
+    # A corrected latest week without some names or users takes over, falling back to older weeks
+    corrected = _export('2025-03-30', 'Fixed ').iloc[5:]
+    corrected.loc[corrected.index[:5], 'name'] = None
+    _upload(store, tmp_path, corrected)
+    _assert_matches_fresh_load(store, tmp_path)
+    assert (_names(store.snapshot().user_dim) == '').sum() == 5
+
+    # Deleting the latest week restores the names of the week before
+    delete_week_partition('2025-03-30', tmp_path)
+    store.delete_weeks([pd.Timestamp('2025-03-30')])
+    assert _names(store.snapshot().user_dim).str.startswith('Old ').all()
+    _assert_matches_fresh_load(store, tmp_path)